@@ -37,13 +37,38 @@ import json
 import logging
 import os
 import re
-from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import Callable, Mapping, Optional, TypeVar
+
+from utils import json_loads
 
 logger = logging.getLogger(__name__)
 
-_LABEL_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_\-]{0,63}$")
-_ENV_VAR_RE = re.compile(r"^\$\{([A-Z_][A-Z0-9_]*)\}$")
+_LABEL_MAX_LEN = 64
+_LABEL_PATTERN = r"^[A-Za-z0-9][A-Za-z0-9_\-]{0,63}$"
+_ENV_VAR_PATTERN = r"^\$\{([A-Z_][A-Z0-9_]*)\}$"
+
+try:
+    # Optional: google-re2 compiles to an automaton with guaranteed
+    # linear-time matching, so user-supplied values can never backtrack.
+    import re2
+
+    _LABEL_RE = re2.compile(_LABEL_PATTERN)
+    _ENV_VAR_RE = re2.compile(_ENV_VAR_PATTERN)
+except ImportError:
+    _LABEL_RE = re.compile(_LABEL_PATTERN, re.ASCII)
+    _ENV_VAR_RE = re.compile(_ENV_VAR_PATTERN, re.ASCII)
+
+# Parsed accounts files: resolved path → ((st_mtime_ns, st_size), accounts);
+# passwords are kept unresolved so ${VAR} references track the environment
+_ACCOUNTS_CACHE: dict[Path, tuple[tuple[int, int], list["AccountConfig"]]] = {}
+
+# Upper bound on concurrently scanned accounts (each holds an IMAP session)
+_MAX_ACCOUNT_WORKERS = 8
+
+_T = TypeVar("_T")
 
 
 # ---------------------------------------------------------------------------
@@ -51,9 +76,14 @@ _ENV_VAR_RE = re.compile(r"^\$\{([A-Z_][A-Z0-9_]*)\}$")
 # ---------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AccountConfig:
-    """Configuration for a single IMAP account."""
+    """
+    Configuration for a single IMAP account.
+
+    Instances are immutable, so one config can be handed to a worker thread
+    (see :func:`run_per_account`) without any locking.
+    """
 
     label: str
     host: str
@@ -70,22 +100,37 @@ class AccountConfig:
         )
 
 
+class DispatchInterrupted(KeyboardInterrupt):
+    """
+    Ctrl-C during :func:`run_per_account`.
+
+    ``results`` holds the results of every account that completed without
+    an exception, in account order.
+    """
+
+    def __init__(self, results: list) -> None:
+        super().__init__()
+        self.results = results
+
+
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
 
-def _resolve_password(raw: str, label: str) -> str:
+def _resolve_password(raw: str, label: str, env: Mapping[str, str]) -> str:
     """
-    Expand a ``${ENV_VAR}`` reference to its environment value.
+    Expand a ``${ENV_VAR}`` reference to its value in *env*.
 
-    Plain strings are returned unchanged.  Raises ``ValueError`` when the
-    referenced variable is not set.
+    *env* is a snapshot of ``os.environ`` taken once per load, so resolving
+    many accounts costs plain dict lookups instead of repeated environment
+    queries.  Plain strings are returned unchanged.  Raises ``ValueError``
+    when the referenced variable is not set.
     """
     m = _ENV_VAR_RE.match(raw.strip())
     if m:
         var_name = m.group(1)
-        value = os.environ.get(var_name)
+        value = env.get(var_name)
         if not value:
             raise ValueError(
                 f"Account '{label}': password references ${{{var_name}}} "
@@ -95,8 +140,18 @@ def _resolve_password(raw: str, label: str) -> str:
     return raw
 
 
+def _resolve_passwords(accounts: list[AccountConfig]) -> list[AccountConfig]:
+    """Return copies of *accounts* with ``${VAR}`` passwords resolved."""
+    env = dict(os.environ)
+    return [
+        replace(a, password=_resolve_password(a.password, a.label, env))
+        for a in accounts
+    ]
+
+
 def _validate_label(label: str) -> None:
-    if not _LABEL_RE.match(label):
+    # Cheap length check first; only well-sized labels reach the regex
+    if not (1 <= len(label) <= _LABEL_MAX_LEN) or not _LABEL_RE.match(label):
         raise ValueError(
             f"Account label {label!r} is invalid. "
             "Use only letters, digits, hyphens, and underscores (max 64 chars)."
@@ -117,10 +172,23 @@ def load_accounts(path: Path) -> list[AccountConfig]:
 
     Raises ``ValueError`` on any validation error so the caller can print a
     clear error message and exit.
+
+    The validated entries are cached per file and reused for as long as the
+    file's modification time and size are unchanged, so repeated loads (e.g.
+    from a long-running process) skip parsing and validation.  ``${VAR}``
+    passwords are not cached: they are resolved against ``os.environ`` on
+    every call, so a changed variable is picked up on the next load.
     """
     try:
-        raw = path.read_text(encoding="utf-8")
-        data = json.loads(raw)
+        stat = path.stat()
+        cache_key = path.resolve()
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = _ACCOUNTS_CACHE.get(cache_key)
+        if cached is not None and cached[0] == stamp:
+            logger.debug("Accounts file '%s' unchanged — using cached accounts", path)
+            return _resolve_passwords(cached[1])
+
+        data = json_loads(path.read_bytes())
     except (OSError, json.JSONDecodeError) as exc:
         raise ValueError(f"Could not read accounts file '{path}': {exc}") from exc
 
@@ -152,22 +220,21 @@ def load_accounts(path: Path) -> list[AccountConfig]:
             )
         seen_labels.add(label)
 
-        password = _resolve_password(str(entry["password"]), label)
-
         accounts.append(
             AccountConfig(
                 label=label,
                 host=str(entry["host"]).strip(),
                 port=int(entry.get("port", 993)),
                 user=str(entry["user"]).strip(),
-                password=password,
+                password=str(entry["password"]),
                 folder=str(entry.get("folder", "INBOX")).strip() or "INBOX",
             )
         )
-        logger.debug(f"Loaded account: {accounts[-1]}")
+        logger.debug("Loaded account: %s", accounts[-1])
 
-    logger.info(f"Loaded {len(accounts)} account(s) from '{path}'")
-    return accounts
+    logger.info("Loaded %d account(s) from '%s'", len(accounts), path)
+    _ACCOUNTS_CACHE[cache_key] = (stamp, accounts)
+    return _resolve_passwords(accounts)
 
 
 def account_from_env() -> AccountConfig:
@@ -186,3 +253,57 @@ def account_from_env() -> AccountConfig:
         password=os.environ["IMAP_PASSWORD"],
         folder=os.environ.get("IMAP_FOLDER", "INBOX"),
     )
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+
+def run_per_account(
+    accounts: list[AccountConfig],
+    worker_fn: Callable[[AccountConfig], _T],
+    on_interrupt: Optional[Callable[[], None]] = None,
+) -> list[_T]:
+    """
+    Run *worker_fn* once per account, scanning accounts concurrently.
+
+    Per-account work is dominated by IMAP and OpenAI round-trips, so threads
+    overlap the network waits and total wall-clock time tracks the slowest
+    account instead of the sum of all accounts.  Results are returned in the
+    same order as *accounts*; the first exception raised by a worker is
+    re-raised here.
+
+    A single account runs on the calling thread, so Ctrl-C interrupts it
+    directly.  With several, Ctrl-C calls *on_interrupt* (e.g. to stop
+    long-running workers), drops the accounts not yet started, waits for
+    the running ones and raises :class:`DispatchInterrupted` with the
+    results of all that completed.  Further Ctrl-C presses during that wait
+    are logged and ignored, so finished results are never lost.
+    """
+    if len(accounts) <= 1:
+        return [worker_fn(account) for account in accounts]
+
+    workers = min(_MAX_ACCOUNT_WORKERS, len(accounts))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="account")
+    futures = [pool.submit(worker_fn, account) for account in accounts]
+    try:
+        return [future.result() for future in futures]
+    except KeyboardInterrupt:
+        if on_interrupt is not None:
+            on_interrupt()
+        while True:
+            try:
+                pool.shutdown(wait=True, cancel_futures=True)
+                break
+            except KeyboardInterrupt:
+                logger.warning("Still stopping — waiting for running accounts to finish")
+        raise DispatchInterrupted(
+            [
+                future.result()
+                for future in futures
+                if not future.cancelled() and future.exception() is None
+            ]
+        ) from None
+    finally:
+        pool.shutdown()
@@ -3,14 +3,35 @@ AI-based invoice classification using the OpenAI API (gpt-4o-mini).
 
 Classification flow:
   1. Send extracted document text with a structured system prompt.
-  2. Receive JSON response specifying invoice metadata.
+  2. Receive JSON response specifying invoice metadata (structured output,
+     constrained to a strict JSON schema).
   3. Retry once on invalid/missing JSON; skip file after two failures.
+
+Several documents can be classified in one request via
+:meth:`InvoiceClassifier.classify_many`, which amortizes the HTTP round-trip
+across up to ``_BATCH_SIZE`` documents and keeps several such requests in
+flight at once.  :class:`BatchingClassifier` feeds it from many threads.
+
+Results are remembered across runs in a :class:`ClassificationCache`, so a
+document whose text was classified before never reaches the API again.
 """
+import hashlib
 import json
 import logging
 import os
-from dataclasses import dataclass
-from typing import Optional
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+from utils import json_loads
 
 logger = logging.getLogger(__name__)
 
@@ -50,17 +71,161 @@ Rules:
 - If uncertain about invoice status, set is_invoice to false.
 """
 
+# Appended to the single-document prompt so both share the same prefix
+_BATCH_SYSTEM_PROMPT = _SYSTEM_PROMPT + """
+Batch mode:
+The user message may contain several documents, each introduced by a line
+"---DOC <n>---".  Apply the rules above to every document independently and
+respond ONLY with a JSON object of this form:
+
+{"results": [{"doc": 0, "is_invoice": false, ...}, ...]}
+
+Each element has the structure shown above plus "doc", the number from its
+"---DOC <n>---" line.  Return exactly one element per document.
+"""
+
 _MODEL = "gpt-4o-mini"
 _MAX_TOKENS = 350
 _TEMPERATURE = 0.0
 
+# Structured outputs: with strict JSON schemas the model can only emit
+# responses of exactly this shape, so malformed JSON and missing fields no
+# longer cost a retry.  Strict mode requires every property to be listed as
+# required and no others to be allowed.
+_RESULT_PROPERTIES: dict = {
+    "is_invoice": {"type": "boolean"},
+    "vendor": {"type": "string"},
+    "invoice_number": {"type": "string"},
+    "date": {"type": "string"},
+    "total_amount": {"type": "string"},
+    "currency": {"type": "string"},
+}
+
+_RESULT_FORMAT: dict = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "invoice_classification",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": _RESULT_PROPERTIES,
+            "required": list(_RESULT_PROPERTIES),
+            "additionalProperties": False,
+        },
+    },
+}
+
+_BATCH_RESULT_FORMAT: dict = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "invoice_classification_batch",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "results": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {"doc": {"type": "integer"}, **_RESULT_PROPERTIES},
+                        "required": ["doc", *_RESULT_PROPERTIES],
+                        "additionalProperties": False,
+                    },
+                },
+            },
+            "required": ["results"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Lowercase substrings, at least one of which (or one of _INVOICE_WORDS)
+# appears in practically every German or English invoice.  Texts containing
+# none of them are rejected without an API call.  Deliberately broad: a false
+# positive only costs one request, a false negative loses an invoice.
+# Substrings so German compounds ("Gesamtbetrag", "Umsatzsteuer") match.
+_INVOICE_KEYWORDS: tuple[str, ...] = (
+    "rechnung",
+    "invoice",
+    "faktura",
+    "quittung",
+    "receipt",
+    "beleg",
+    "betrag",
+    "summe",
+    "mwst",
+    "steuer",
+    "netto",
+    "brutto",
+    "iban",
+    "zahlungsziel",
+)
+
+# Short keywords matched as whole words only: as substrings they occur in
+# almost any English text ("ust" in "just"/"August", "vat" in "private",
+# "tax" in "syntax"), which would let nearly everything through.
+_INVOICE_WORDS: tuple[str, ...] = ("total", "ust", "vat", "tax")
+_INVOICE_WORDS_PATTERN = r"\b(?:" + "|".join(_INVOICE_WORDS) + r")\b"
+_INVOICE_WORD_RE = re.compile(_INVOICE_WORDS_PATTERN, re.IGNORECASE)
+
+try:
+    # Optional: google-re2 finds any keyword in one linear pass over the text,
+    # several times faster than one substring scan per keyword.  (A stdlib
+    # ``re`` alternation is slower than the scans, so it is not a fallback.)
+    import re2
+
+    _INVOICE_KEYWORD_RE = re2.compile(
+        "(?i)"
+        + "|".join(re.escape(kw) for kw in _INVOICE_KEYWORDS)
+        + "|" + _INVOICE_WORDS_PATTERN
+    )
+except ImportError:
+    _INVOICE_KEYWORD_RE = None
+
+try:
+    # Optional: BLAKE3 hashes cache keys several times faster than SHA-256.
+    # Keys carry the algorithm name, so switching never returns a wrong hit —
+    # entries written with the other algorithm are just cache misses.
+    from blake3 import blake3 as _text_hash
+
+    _TEXT_HASH_NAME = "blake3"
+except ImportError:
+    _text_hash = hashlib.sha256
+    _TEXT_HASH_NAME = "sha256"
+
+_TIMEOUT_SECONDS = 45.0
+# HTTP connection pool shared by every classifier in the process
+_MAX_CONNECTIONS = 32
+_MAX_KEEPALIVE_CONNECTIONS = 16
+
+# Documents per classify_many request (each is at most ~2 000 tokens)
+_BATCH_SIZE = 5
+# Batch requests classify_many keeps in flight concurrently
+_MAX_CONCURRENT_REQUESTS = 8
+# Persistent result cache, one per directory (the invoices output directory,
+# so runs from cron or another working directory share it)
+_CACHE_FILENAME = ".classify_cache.sqlite"
+# Part of every cache key: editing a prompt or the model invalidates old entries
+_CACHE_NAMESPACE = hashlib.sha256(
+    f"{_MODEL}\0{_BATCH_SYSTEM_PROMPT}".encode()
+).hexdigest()[:16]
+
+# Routes every request to the same OpenAI prompt-cache partition.  Both
+# prompts start with _SYSTEM_PROMPT and all per-document text goes in the
+# user message, so the system prefix is byte-identical on every call.
+_PROMPT_CACHE_KEY = f"mailinvoice-classifier-{_CACHE_NAMESPACE}"
+
+# BatchingClassifier: texts collected across threads before a batch is sent
+_COLLECT_MAX_ITEMS = 10
+_COLLECT_MAX_WAIT_SECONDS = 2.0
+
 
 # ---------------------------------------------------------------------------
 # Data model
 # ---------------------------------------------------------------------------
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ClassificationResult:
     is_invoice: bool
     vendor: str
@@ -81,6 +246,142 @@ class ClassificationResult:
         )
 
 
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+
+_client: Optional["OpenAI"] = None
+_client_lock = threading.Lock()
+
+
+def _get_client(api_key: str) -> "OpenAI":
+    """
+    Return the process-wide OpenAI client, creating it on first use.
+
+    Every :class:`InvoiceClassifier` (one per scanned account) shares this
+    client and therefore one pooled set of keep-alive connections, so TLS
+    handshakes and DNS lookups are paid once per process, not per account.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from openai import DEFAULT_CONNECTION_LIMITS, DefaultHttpxClient, OpenAI
+
+            # Build the limits with the SDK's own Limits type so this does not
+            # depend on which httpx distribution the installed SDK uses.
+            limits = type(DEFAULT_CONNECTION_LIMITS)(
+                max_connections=_MAX_CONNECTIONS,
+                max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+            )
+            _client = OpenAI(
+                api_key=api_key,
+                timeout=_TIMEOUT_SECONDS,
+                http_client=DefaultHttpxClient(limits=limits),
+            )
+        return _client
+
+
+class ClassificationCache:
+    """
+    Persistent document-text → :class:`ClassificationResult` map in sqlite.
+
+    Keys are the BLAKE3 (or, without the ``blake3`` package, SHA-256) digest
+    of the text plus :data:`_CACHE_NAMESPACE`.  One
+    connection is shared by all threads and serialized by a lock.  Storage
+    errors are logged and treated as cache misses — the cache never makes a
+    classification fail.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS classifications "
+            "(key TEXT PRIMARY KEY, result TEXT NOT NULL) WITHOUT ROWID"
+        )
+
+    @staticmethod
+    def _key(text: str) -> str:
+        digest = _text_hash(text.encode("utf-8", errors="surrogatepass")).hexdigest()
+        return f"{_TEXT_HASH_NAME}:{digest}:{_CACHE_NAMESPACE}"
+
+    def get_many(self, texts: list[str]) -> list[Optional[ClassificationResult]]:
+        """Cached result per text, ``None`` where there is none."""
+        keys = [self._key(text) for text in texts]
+        found: dict[str, str] = {}
+        try:
+            with self._lock:
+                # Stay well below sqlite's bound-parameter limit
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    found.update(
+                        self._db.execute(
+                            "SELECT key, result FROM classifications WHERE key IN "
+                            f"({','.join('?' * len(chunk))})",
+                            chunk,
+                        ).fetchall()
+                    )
+        except sqlite3.Error as exc:
+            logger.warning("Classification cache lookup failed: %s", exc)
+            return [None] * len(texts)
+        results: list[Optional[ClassificationResult]] = []
+        for key in keys:
+            raw = found.get(key)
+            try:
+                results.append(ClassificationResult(**json_loads(raw)) if raw else None)
+            except (TypeError, ValueError):
+                results.append(None)  # written by an incompatible version
+        return results
+
+    def put_many(self, items: list[tuple[str, ClassificationResult]]) -> None:
+        rows = [(self._key(text), json.dumps(asdict(result))) for text, result in items]
+        if not rows:
+            return
+        try:
+            with self._lock:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO classifications (key, result) VALUES (?, ?)",
+                    rows,
+                )
+        except sqlite3.Error as exc:
+            logger.warning("Classification cache write failed: %s", exc)
+
+
+_caches: dict[Path, ClassificationCache] = {}
+_cache_lock = threading.Lock()
+
+
+def _get_cache(cache_dir: Path) -> Optional[ClassificationCache]:
+    """Return the cache in *cache_dir*, or ``None`` if it cannot be opened."""
+    path = (cache_dir / _CACHE_FILENAME).resolve()
+    with _cache_lock:
+        if path not in _caches:
+            try:
+                _caches[path] = ClassificationCache(path)
+            except (OSError, sqlite3.Error) as exc:
+                logger.warning(
+                    "Cannot open %s (%s) — classifying without a cache", path, exc
+                )
+                return None
+        return _caches[path]
+
+
+def _has_invoice_keyword(text: str) -> bool:
+    """Return True if *text* contains at least one invoice keyword."""
+    if _INVOICE_KEYWORD_RE is not None:
+        return _INVOICE_KEYWORD_RE.search(text) is not None
+    lowered = text.lower()
+    return (
+        any(kw in lowered for kw in _INVOICE_KEYWORDS)
+        or _INVOICE_WORD_RE.search(lowered) is not None
+    )
+
+
 # ---------------------------------------------------------------------------
 # Classifier
 # ---------------------------------------------------------------------------
@@ -89,28 +390,37 @@ class ClassificationResult:
 class InvoiceClassifier:
     """Classifies document text as invoice/non-invoice using OpenAI."""
 
-    def __init__(self) -> None:
+    def __init__(self, use_cache: bool = True, cache_dir: Path = Path(".")) -> None:
         api_key = os.environ.get("OPENAI_API_KEY", "").strip()
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY is not set in the environment")
 
-        from openai import OpenAI
-
-        self._client = OpenAI(api_key=api_key, timeout=45.0)
+        self._client = _get_client(api_key)
+        self._cache = _get_cache(cache_dir) if use_cache else None
 
     def classify(self, text: str) -> Optional[ClassificationResult]:
         """
         Classify *text* as invoice or not.
 
-        Retries once on bad JSON.  Returns ``None`` if both attempts fail
-        or an unrecoverable API error occurs.
+        Texts without any invoice keyword are rejected locally, and texts
+        classified before are answered from the cache.  Retries once on bad
+        JSON.  Returns ``None`` if both attempts fail or an unrecoverable API
+        error occurs.
         """
+        return self.classify_many([text])[0]
+
+    def _classify_one(self, text: str) -> Optional[ClassificationResult]:
+        """:meth:`classify` without the cache."""
+        if not _has_invoice_keyword(text):
+            logger.debug("No invoice keyword in text — skipping OpenAI call")
+            return ClassificationResult.not_invoice()
+
         for attempt in range(1, 3):
             try:
                 result = self._call_api(text)
                 if result is not None:
                     return result
-                logger.debug(f"Classification attempt {attempt}/2 returned None — retrying")
+                logger.debug("Classification attempt %d/2 returned None — retrying", attempt)
             except Exception as exc:  # noqa: BLE001 — handled per type below
                 if not self._handle_api_error(exc, attempt):
                     return None  # unrecoverable
@@ -118,32 +428,173 @@ class InvoiceClassifier:
         logger.error("Classification failed after 2 attempts — skipping attachment")
         return None
 
+    def classify_many(self, texts: list[str]) -> list[Optional[ClassificationResult]]:
+        """
+        Classify several documents, sending up to ``_BATCH_SIZE`` per request.
+
+        Batches are dispatched concurrently (at most
+        ``_MAX_CONCURRENT_REQUESTS`` in flight) over the shared client, whose
+        connection pool is thread-safe, so the wall-clock cost approaches a
+        single round-trip.  Returns one entry per input text, in order.
+        Documents missing from an empty or malformed batch response are
+        retried individually; when the request itself fails they come back
+        as ``None``.  Texts without any invoice keyword, and texts found in
+        the cache, never reach the API.
+        """
+        results: list[Optional[ClassificationResult]] = [
+            ClassificationResult.not_invoice() for _ in texts
+        ]
+        candidates = [i for i, text in enumerate(texts) if _has_invoice_keyword(text)]
+        if self._cache is not None and candidates:
+            cached = self._cache.get_many([texts[i] for i in candidates])
+            for idx, hit in zip(candidates, cached):
+                if hit is not None:
+                    results[idx] = hit
+            candidates = [idx for idx, hit in zip(candidates, cached) if hit is None]
+        chunks = [
+            candidates[i:i + _BATCH_SIZE] for i in range(0, len(candidates), _BATCH_SIZE)
+        ]
+
+        def run(indices: list[int]) -> list[Optional[ClassificationResult]]:
+            return self._classify_chunk([texts[i] for i in indices])
+
+        if len(chunks) <= 1:
+            chunk_results = [run(chunk) for chunk in chunks]
+        else:
+            workers = min(_MAX_CONCURRENT_REQUESTS, len(chunks))
+            with ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="classify"
+            ) as ex:
+                chunk_results = list(ex.map(run, chunks))
+
+        for indices, chunk_result in zip(chunks, chunk_results):
+            for idx, result in zip(indices, chunk_result):
+                results[idx] = result
+        if self._cache is not None:
+            # Failures (None) are not cached so the next run retries them
+            self._cache.put_many(
+                [(texts[i], results[i]) for i in candidates if results[i] is not None]
+            )
+        return results
+
     # ------------------------------------------------------------------
     # Internals
     # ------------------------------------------------------------------
 
-    def _call_api(self, text: str) -> Optional[ClassificationResult]:
-        """Send request to OpenAI and parse the JSON response."""
+    def _classify_chunk(self, texts: list[str]) -> list[Optional[ClassificationResult]]:
+        """Classify one ``_BATCH_SIZE`` chunk, falling back per document."""
+        batch = self._classify_batch(texts) if len(texts) > 1 else {}
+        if batch is None:
+            # The API itself failed; one request per document would fail alike
+            return [None] * len(texts)
+        return [
+            batch[idx] if idx in batch else self._classify_one(text)
+            for idx, text in enumerate(texts)
+        ]
+
+    def _classify_batch(
+        self, texts: list[str]
+    ) -> Optional[dict[int, ClassificationResult]]:
+        """
+        Classify *texts* in a single request.
+
+        Returns a mapping of document index → result; indices that could not
+        be classified are simply absent.  Retries once like :meth:`classify`.
+        Returns ``None`` when the request itself failed (e.g. authentication
+        or quota errors), so the caller does not repeat it per document.
+        """
+        for attempt in range(1, 3):
+            try:
+                results = self._call_batch_api(texts)
+                if results:
+                    return results
+                logger.debug("Batch classification attempt %d/2 returned nothing", attempt)
+            except Exception as exc:  # noqa: BLE001 — handled per type below
+                if not self._handle_api_error(exc, attempt):
+                    logger.warning(
+                        "Batch classification of %d documents failed — skipping them",
+                        len(texts),
+                    )
+                    return None
+
+        logger.warning(
+            "Batch classification of %d documents failed — classifying individually",
+            len(texts),
+        )
+        return {}
+
+    def _call_batch_api(self, texts: list[str]) -> dict[int, ClassificationResult]:
+        """Send several documents in one request and parse the indexed results."""
+        content = self._create_completion(
+            _BATCH_SYSTEM_PROMPT,
+            "\n\n".join(f"---DOC {i}---\n{text}" for i, text in enumerate(texts)),
+            max_tokens=_MAX_TOKENS * len(texts),
+            response_format=_BATCH_RESULT_FORMAT,
+        )
+        if not content:
+            logger.warning("OpenAI returned an empty batch response")
+            return {}
+
+        try:
+            data = json_loads(content)
+        except json.JSONDecodeError as exc:
+            logger.warning("Batch JSON parse error: %s | raw: %.300s", exc, content)
+            return {}
+
+        items = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(items, list):
+            logger.warning("Batch response has no 'results' array | raw: %.300s", content)
+            return {}
+
+        results: dict[int, ClassificationResult] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            idx = item.get("doc")
+            if not isinstance(idx, int) or not 0 <= idx < len(texts):
+                continue
+            result = self._build_result(item)
+            if result is not None:
+                results[idx] = result
+        return results
+
+    def _create_completion(
+        self,
+        system_prompt: str,
+        user_content: str,
+        max_tokens: int,
+        response_format: dict,
+    ) -> Optional[str]:
+        """Run one chat completion with structured output and return the raw content."""
         response = self._client.chat.completions.create(
             model=_MODEL,
             messages=[
-                {"role": "system", "content": _SYSTEM_PROMPT},
-                {"role": "user", "content": f"Document text:\n\n{text}"},
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_content},
             ],
-            max_tokens=_MAX_TOKENS,
+            max_tokens=max_tokens,
             temperature=_TEMPERATURE,
-            response_format={"type": "json_object"},  # openai v2 TypedDict, dict accepted
+            response_format=response_format,  # openai v2 TypedDict, dict accepted
+            prompt_cache_key=_PROMPT_CACHE_KEY,
         )
+        return response.choices[0].message.content
 
-        content = response.choices[0].message.content
+    def _call_api(self, text: str) -> Optional[ClassificationResult]:
+        """Send request to OpenAI and parse the JSON response."""
+        content = self._create_completion(
+            _SYSTEM_PROMPT,
+            f"Document text:\n\n{text}",
+            max_tokens=_MAX_TOKENS,
+            response_format=_RESULT_FORMAT,
+        )
         if not content:
             logger.warning("OpenAI returned an empty response")
             return None
 
         try:
-            data = json.loads(content)
+            data = json_loads(content)
         except json.JSONDecodeError as exc:
-            logger.warning(f"JSON parse error: {exc} | raw: {content[:300]}")
+            logger.warning("JSON parse error: %s | raw: %.300s", exc, content)
             return None
 
         return self._build_result(data)
@@ -161,7 +612,7 @@ class InvoiceClassifier:
                 currency=str(data.get("currency") or "EUR").strip().upper() or "EUR",
             )
         except Exception as exc:
-            logger.warning(f"Failed to build ClassificationResult: {exc}")
+            logger.warning("Failed to build ClassificationResult: %s", exc)
             return None
 
     def _handle_api_error(self, exc: Exception, attempt: int) -> bool:
@@ -179,8 +630,112 @@ class InvoiceClassifier:
             logger.error("OpenAI rate limit exceeded — skipping this attachment")
             return False
         if isinstance(exc, APIConnectionError):
-            logger.warning(f"OpenAI connection error (attempt {attempt}/2): {exc}")
+            logger.warning("OpenAI connection error (attempt %d/2): %s", attempt, exc)
             return attempt < 2  # retry once
         # Generic API error
-        logger.warning(f"OpenAI API error (attempt {attempt}/2): {exc}")
+        logger.warning("OpenAI API error (attempt %d/2): %s", attempt, exc)
         return attempt < 2
+
+
+# ---------------------------------------------------------------------------
+# Cross-thread batching
+# ---------------------------------------------------------------------------
+
+
+class BatchingClassifier:
+    """
+    Collects :meth:`submit` calls from many threads into
+    :meth:`InvoiceClassifier.classify_many` requests.
+
+    A batch is sent once ``max_items`` texts are waiting or the oldest one has
+    waited ``max_wait`` seconds, whichever comes first.  Callers get a
+    :class:`~concurrent.futures.Future` back immediately and never block on
+    the API; :meth:`close` flushes the remainder and waits for every result.
+    """
+
+    def __init__(
+        self,
+        classifier: InvoiceClassifier,
+        max_items: int = _COLLECT_MAX_ITEMS,
+        max_wait: float = _COLLECT_MAX_WAIT_SECONDS,
+    ) -> None:
+        self._classifier = classifier
+        self._max_items = max_items
+        self._max_wait = max_wait
+        self._pending: list[tuple[str, "Future[Optional[ClassificationResult]]"]] = []
+        self._oldest = 0.0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Batches are sent off the collector thread so the next one can fill
+        # while earlier requests are still in flight.
+        self._senders = ThreadPoolExecutor(
+            max_workers=_MAX_CONCURRENT_REQUESTS // 2, thread_name_prefix="classify-batch"
+        )
+        self._collector = threading.Thread(
+            target=self._collect, name="classify-collector", daemon=True
+        )
+        self._collector.start()
+
+    def submit(self, text: str) -> "Future[Optional[ClassificationResult]]":
+        """Queue *text*; the future resolves to what :meth:`InvoiceClassifier.classify` returns."""
+        future: "Future[Optional[ClassificationResult]]" = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchingClassifier is closed")
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append((text, future))
+            # Wake the collector to start the wait timer, or send a full batch
+            if len(self._pending) in (1, self._max_items):
+                self._cond.notify()
+        return future
+
+    def close(self) -> None:
+        """Send everything still queued and wait until every future is resolved."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._collector.join()
+        self._senders.shutdown(wait=True)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _collect(self) -> None:
+        while (batch := self._next_batch()) is not None:
+            self._senders.submit(self._send, batch)
+
+    def _next_batch(
+        self,
+    ) -> Optional[list[tuple[str, "Future[Optional[ClassificationResult]]"]]]:
+        """Block until a batch is due; ``None`` once closed and drained."""
+        with self._cond:
+            while len(self._pending) < self._max_items:
+                if self._closed:
+                    if not self._pending:
+                        return None
+                    break
+                if not self._pending:
+                    self._cond.wait()
+                    continue
+                remaining = self._oldest + self._max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self._max_items]
+            del self._pending[:self._max_items]
+            self._oldest = time.monotonic()
+            return batch
+
+    def _send(
+        self, batch: list[tuple[str, "Future[Optional[ClassificationResult]]"]]
+    ) -> None:
+        try:
+            results = self._classifier.classify_many([text for text, _ in batch])
+        except Exception as exc:  # noqa: BLE001 — surfaced through the futures
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
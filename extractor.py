@@ -2,20 +2,35 @@
 Text extraction from PDF, image (OCR), and DOCX file formats.
 
 Extraction pipeline:
-  PDF  → pdfplumber (primary) → PyPDF2 (fallback)
-  Image → pytesseract OCR (German + English)
+  PDF  → pypdfium2 (primary) → pdfplumber → PyPDF2 (fallbacks)
+  Image → tesserocr (in-process) → pytesseract (fallback) OCR, German + English
   DOCX → python-docx (paragraphs + tables)
 """
+import hashlib
 import io
+import itertools
 import logging
+import multiprocessing
 import os
-from typing import Optional
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Iterable, Iterator, Optional
 
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Optional dependency probes — missing libraries degrade gracefully
 # ---------------------------------------------------------------------------
+try:
+    import pypdfium2  # noqa: F401
+
+    _HAS_PDFIUM = True
+except ImportError:
+    _HAS_PDFIUM = False
+    logger.warning("pypdfium2 not installed — pdfplumber/PyPDF2 will be used for PDFs")
+
 try:
     import pdfplumber  # noqa: F401
 
@@ -31,6 +46,14 @@ try:
 except ImportError:
     _HAS_PYPDF2 = False
 
+try:
+    import tesserocr  # noqa: F401
+    from PIL import Image  # noqa: F401
+
+    _HAS_TESSEROCR = True
+except ImportError:
+    _HAS_TESSEROCR = False
+
 try:
     import pytesseract  # noqa: F401
     from PIL import Image  # noqa: F401
@@ -38,10 +61,11 @@ try:
     _HAS_TESSERACT = True
 except ImportError:
     _HAS_TESSERACT = False
-    logger.warning(
-        "pytesseract/Pillow not installed — image OCR disabled. "
-        "Install tesseract-ocr and run: pip install pytesseract Pillow"
-    )
+    if not _HAS_TESSEROCR:
+        logger.warning(
+            "pytesseract/Pillow not installed — image OCR disabled. "
+            "Install tesseract-ocr and run: pip install pytesseract Pillow"
+        )
 
 try:
     from docx import Document as _DocxDocument  # noqa: F401
@@ -54,9 +78,155 @@ except ImportError:
 # Maximum characters forwarded to the AI classifier (~2 000 tokens)
 _MAX_TEXT_LENGTH = 8_000
 
+_IMAGE_EXTENSIONS: frozenset[str] = frozenset({".png", ".jpg", ".jpeg"})
+
+# Lowercase file extension → TextExtractor method name
+_HANDLERS: dict[str, str] = {
+    ".pdf": "_extract_pdf",
+    ".docx": "_extract_docx",
+    **dict.fromkeys(_IMAGE_EXTENSIONS, "_extract_image"),
+}
+
+# Number of extraction results kept in the per-extractor LRU cache
+_CACHE_SIZE = 512
+
+# Longest image side handed to Tesseract; larger scans are downscaled
+_OCR_MAX_SIDE = 2_000
+# German + English for invoice text recognition
+_OCR_LANG = "deu+eng"
+
+
+def _extension(filename: str) -> str:
+    return os.path.splitext(filename.lower())[1]
+
+
+def _cache_key(ext: str, data: bytes) -> tuple[str, bytes]:
+    return (ext, hashlib.blake2b(data, digest_size=16).digest())
+
+
+def _extract_in_worker(item: tuple[str, bytes]) -> Optional[str]:
+    """Process-pool entry point: extract one item with a per-process extractor."""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = TextExtractor()
+    filename, data = item
+    return _worker_extractor._extract_uncached(_extension(filename), filename, data)
+
+
+def _join_bounded(pieces: Iterable[Optional[str]]) -> Optional[str]:
+    """
+    Join the non-empty *pieces* with newlines, up to ``_MAX_TEXT_LENGTH``.
+
+    Pieces are written into a single buffer that stops growing at the
+    budget, and *pieces* is not consumed any further once it is reached — so
+    a lazy page iterator never extracts pages whose text would be cut off.
+    Returns ``None`` when nothing but whitespace was collected.
+    """
+    buf = io.StringIO()
+    remaining = _MAX_TEXT_LENGTH
+    for piece in pieces:
+        if not piece:
+            continue
+        take = piece[:remaining]
+        buf.write(take)
+        buf.write("\n")
+        remaining -= len(take) + 1
+        if remaining <= 0:
+            break
+    return buf.getvalue().strip() or None
+
+
+def _skip_repeats(pieces: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the non-empty *pieces*, dropping consecutive duplicates.
+
+    python-docx reports a merged table cell once per grid column it spans;
+    without this the repeats would eat into the text budget.
+    """
+    previous = None
+    for piece in pieces:
+        if piece and piece != previous:
+            yield piece
+            previous = piece
+
+
+def _prepare_for_ocr(image: "Image.Image") -> "Image.Image":
+    """
+    Reduce *image* to 8-bit grayscale no larger than ``_OCR_MAX_SIDE``.
+
+    Tesseract's cost scales with pixel count × channels, and invoice text is
+    perfectly legible at ~2 000 px.  Transparent areas are flattened onto
+    white first so they do not turn into black blocks in grayscale.
+    """
+    from PIL import Image
+
+    # JPEG can decode straight to a reduced-size grayscale image
+    image.draft("L", (_OCR_MAX_SIDE, _OCR_MAX_SIDE))
+
+    if image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    ):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, "white")
+        image = Image.alpha_composite(background, image)
+
+    image = image.convert("L")
+    if max(image.size) > _OCR_MAX_SIDE:
+        image.thumbnail((_OCR_MAX_SIDE, _OCR_MAX_SIDE), Image.Resampling.LANCZOS)
+    return image
+
+
+# PDFium is not thread-safe; all pypdfium2 calls in the process share this lock
+_PDFIUM_LOCK = threading.Lock()
+
+# Extractor owned by a process-pool worker (see _extract_in_worker)
+_worker_extractor: Optional["TextExtractor"] = None
+
 
 class TextExtractor:
-    """Dispatches text extraction to the appropriate backend by file extension."""
+    """
+    Dispatches text extraction to the appropriate backend by file extension.
+
+    Results are memoized by content hash: mailboxes routinely contain the same
+    attachment many times (re-sent invoices, logo images in signatures), and
+    a BLAKE2 digest is far cheaper than another PDF parse or OCR pass.
+
+    An instance may be shared between threads; the cache and the resident
+    Tesseract engine are guarded by locks.
+
+    With *processes* > 0, :meth:`extract_many` parses cache misses on a
+    process pool of that size, started on first use and kept until
+    :meth:`close`, so the CPU-bound parsing of several threads runs in
+    parallel instead of serializing on the GIL.
+    """
+
+    def __init__(
+        self, max_input_bytes: Optional[int] = None, processes: int = 0
+    ) -> None:
+        # Inputs above this size are refused rather than parsed
+        self._max_input_bytes = max_input_bytes
+        self._processes = processes
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, bytes], Optional[str]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._tess_lock = threading.Lock()
+        # tesserocr API handle, created on the first image; keeps the
+        # Tesseract models loaded instead of spawning a process per image.
+        self._tess_api: Any = None
+        self._tess_api_failed = False
+
+    def close(self) -> None:
+        """Stop the process pool and release the resident Tesseract engine."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            self._processes = 0
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        with self._tess_lock:
+            if self._tess_api is not None:
+                self._tess_api.End()
+                self._tess_api = None
 
     def extract(self, filename: str, data: bytes) -> Optional[str]:
         """
@@ -64,115 +234,248 @@ class TextExtractor:
 
         Returns the extracted text (possibly truncated) or ``None`` on failure.
         """
-        ext = os.path.splitext(filename.lower())[1]
+        if self._too_large(filename, data):
+            return None
 
-        if ext == ".pdf":
-            return self._extract_pdf(data)
-        if ext in {".png", ".jpg", ".jpeg"}:
-            return self._extract_image(data, filename)
-        if ext == ".docx":
-            return self._extract_docx(data, filename)
+        ext = _extension(filename)
+        key = _cache_key(ext, data)
 
-        logger.warning(f"No extractor registered for extension '{ext}' — skipping")
-        return None
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                logger.debug("Extraction cache hit for '%s'", filename)
+                return self._cache[key]
+
+        text = self._extract_uncached(ext, filename, data)
+        self._remember(key, text)
+        return text
+
+    def extract_many(self, items: list[tuple[str, bytes]]) -> list[Optional[str]]:
+        """
+        Extract text from several ``(filename, data)`` pairs.
+
+        Cache hits are served directly and duplicate attachments are parsed
+        once.  The remaining items go to the process pool when one is
+        configured, and are extracted in-process otherwise.
+        Returns one entry per item, in order.
+        """
+        # Oversized items get no key and come back as None
+        keys = [
+            None if self._too_large(name, data) else _cache_key(_extension(name), data)
+            for name, data in items
+        ]
+        texts: dict[tuple[str, bytes], Optional[str]] = {}
+        pending: dict[tuple[str, bytes], tuple[str, bytes]] = {}
+        with self._cache_lock:
+            for key, item in zip(keys, items):
+                if key is None:
+                    continue
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    texts[key] = self._cache[key]
+                else:
+                    pending.setdefault(key, item)
+
+        pool = self._get_pool() if pending else None
+        if pool is not None:
+            try:
+                futures = [pool.submit(_extract_in_worker, item) for item in pending.values()]
+                for key, future in zip(pending, futures):
+                    try:
+                        texts[key] = future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as exc:
+                        logger.warning(
+                            "Extraction failed for '%s': %s", pending[key][0], exc
+                        )
+                        texts[key] = None
+            except BrokenProcessPool as exc:
+                logger.warning(
+                    "Extraction process pool failed (%s) — extracting in-process", exc
+                )
+                self._drop_pool(pool)
+        for key, (name, data) in pending.items():
+            if key not in texts:
+                texts[key] = self._extract_uncached(key[0], name, data)
+            self._remember(key, texts[key])
+
+        return [None if key is None else texts[key] for key in keys]
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._pool_lock:
+            if self._pool is None and self._processes > 0:
+                logger.debug("Starting %d extraction process(es)", self._processes)
+                # "spawn" rather than fork: the scanner runs fetch and worker
+                # threads, and forking a multi-threaded process can deadlock
+                # the child.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._processes,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _drop_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Stop using a broken *pool*; later batches are extracted in-process."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+                self._processes = 0
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _too_large(self, filename: str, data: bytes) -> bool:
+        if self._max_input_bytes is not None and len(data) > self._max_input_bytes:
+            logger.warning(
+                "Skipping '%s' — %d bytes exceeds the %d byte extraction limit",
+                filename, len(data), self._max_input_bytes,
+            )
+            return True
+        return False
+
+    def _remember(self, key: tuple[str, bytes], text: Optional[str]) -> None:
+        with self._cache_lock:
+            self._cache[key] = text
+            self._cache.move_to_end(key)
+            if len(self._cache) > _CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    def _extract_uncached(self, ext: str, filename: str, data: bytes) -> Optional[str]:
+        handler = _HANDLERS.get(ext)
+        if handler is None:
+            logger.warning("No extractor registered for extension '%s' — skipping", ext)
+            return None
+        return getattr(self, handler)(data, filename)
 
     # ------------------------------------------------------------------
     # PDF
     # ------------------------------------------------------------------
 
-    def _extract_pdf(self, data: bytes) -> Optional[str]:
+    def _extract_pdf(self, data: bytes, filename: str) -> Optional[str]:
+        if _HAS_PDFIUM:
+            try:
+                return self._pdf_via_pdfium(data)
+            except Exception as exc:
+                logger.warning("pypdfium2 failed (%s) — trying pdfplumber fallback", exc)
+
         if _HAS_PDFPLUMBER:
             try:
                 return self._pdf_via_pdfplumber(data)
             except Exception as exc:
-                logger.warning(f"pdfplumber failed ({exc}) — trying PyPDF2 fallback")
+                logger.warning("pdfplumber failed (%s) — trying PyPDF2 fallback", exc)
 
         if _HAS_PYPDF2:
             try:
                 return self._pdf_via_pypdf2(data)
             except Exception as exc:
-                logger.error(f"PyPDF2 fallback also failed: {exc}")
+                logger.error("PyPDF2 fallback also failed: %s", exc)
                 return None
 
         logger.error("No PDF extraction library available (install pdfplumber or PyPDF2)")
         return None
 
+    def _pdf_via_pdfium(self, data: bytes) -> Optional[str]:
+        # PDFium is native code and only extracts the text layer, which is
+        # all the classifier needs — much faster than pdfminer-based parsing.
+        import pypdfium2 as pdfium
+
+        def page_texts(pdf: "pdfium.PdfDocument") -> Iterator[str]:
+            for page in pdf:
+                textpage = page.get_textpage()
+                page_text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                yield page_text
+
+        with _PDFIUM_LOCK:
+            pdf = pdfium.PdfDocument(data)
+            try:
+                return _join_bounded(page_texts(pdf))
+            finally:
+                pdf.close()
+
     def _pdf_via_pdfplumber(self, data: bytes) -> Optional[str]:
         import pdfplumber
 
-        parts: list[str] = []
+        # extract_text_simple clusters characters into lines without the
+        # layout analysis of extract_text(); raw reading order is enough
+        # for classification.
         with pdfplumber.open(io.BytesIO(data)) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    parts.append(page_text)
-
-        text = "\n".join(parts).strip()
-        return text[:_MAX_TEXT_LENGTH] or None
+            return _join_bounded(page.extract_text_simple() for page in pdf.pages)
 
     def _pdf_via_pypdf2(self, data: bytes) -> Optional[str]:
         import PyPDF2
 
-        parts: list[str] = []
         reader = PyPDF2.PdfReader(io.BytesIO(data))
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                parts.append(page_text)
-
-        text = "\n".join(parts).strip()
-        return text[:_MAX_TEXT_LENGTH] or None
+        return _join_bounded(page.extract_text() for page in reader.pages)
 
     # ------------------------------------------------------------------
     # Images
     # ------------------------------------------------------------------
 
     def _extract_image(self, data: bytes, filename: str) -> Optional[str]:
-        if not _HAS_TESSERACT:
-            logger.warning(f"Skipping image '{filename}' — pytesseract not available")
+        if not (_HAS_TESSEROCR or _HAS_TESSERACT):
+            logger.warning("Skipping image '%s' — pytesseract not available", filename)
             return None
 
         try:
-            import pytesseract
             from PIL import Image
 
-            image = Image.open(io.BytesIO(data))
-            # Use German + English for invoice text recognition
-            text = pytesseract.image_to_string(image, lang="deu+eng")
-            text = text.strip()
+            image = _prepare_for_ocr(Image.open(io.BytesIO(data)))
+            text = self._ocr(image).strip()
             return text[:_MAX_TEXT_LENGTH] or None
         except Exception as exc:
-            logger.error(f"OCR failed for '{filename}': {exc}")
+            logger.error("OCR failed for '%s': %s", filename, exc)
             return None
 
+    def _ocr(self, image: "Image.Image") -> str:
+        with self._tess_lock:
+            api = self._get_tess_api()
+            if api is not None:
+                api.SetImage(image)
+                return api.GetUTF8Text()
+
+        import pytesseract
+
+        return pytesseract.image_to_string(image, lang=_OCR_LANG)
+
+    def _get_tess_api(self) -> Any:
+        """Return the resident tesserocr API, or None to use pytesseract."""
+        if self._tess_api is None and _HAS_TESSEROCR and not self._tess_api_failed:
+            try:
+                import tesserocr
+
+                self._tess_api = tesserocr.PyTessBaseAPI(lang=_OCR_LANG)
+            except Exception as exc:
+                self._tess_api_failed = True
+                if not _HAS_TESSERACT:
+                    raise
+                logger.warning("tesserocr unavailable (%s) — using pytesseract", exc)
+        return self._tess_api
+
     # ------------------------------------------------------------------
     # DOCX
     # ------------------------------------------------------------------
 
     def _extract_docx(self, data: bytes, filename: str) -> Optional[str]:
         if not _HAS_DOCX:
-            logger.warning(f"Skipping DOCX '{filename}' — python-docx not available")
+            logger.warning("Skipping DOCX '%s' — python-docx not available", filename)
             return None
 
         try:
             from docx import Document
 
             doc = Document(io.BytesIO(data))
-            parts: list[str] = []
-
-            for para in doc.paragraphs:
-                if para.text.strip():
-                    parts.append(para.text.strip())
-
+            paragraphs = (para.text.strip() for para in doc.paragraphs)
             # Also pull text from tables (invoices often embed line items in tables)
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            parts.append(cell.text.strip())
-
-            text = "\n".join(parts).strip()
-            return text[:_MAX_TEXT_LENGTH] or None
+            cells = (
+                cell.text.strip()
+                for table in doc.tables
+                for row in table.rows
+                for cell in row.cells
+            )
+            # Lazy all the way down: python-docx only walks as much of the
+            # document as fits in the text budget.
+            return _join_bounded(_skip_repeats(itertools.chain(paragraphs, cells)))
         except Exception as exc:
-            logger.error(f"DOCX extraction failed for '{filename}': {exc}")
+            logger.error("DOCX extraction failed for '%s': %s", filename, exc)
             return None
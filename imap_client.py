@@ -4,20 +4,55 @@ streams attachments, and coordinates extraction + classification.
 
 Design choices:
 - UID-based search and fetch (stable across reconnects)
-- Emails fetched one at a time (memory-efficient for large mailboxes)
-- RFC822.SIZE pre-check to skip oversized messages early
-- Attachment parts decoded individually from MIME tree
+- UIDs are sharded across a small pool of IMAP sessions; fetch threads feed
+  a bounded queue and worker threads hand attachments to a small process
+  pool for text extraction
+- Extracted texts are classified in cross-thread batches; invoices are saved
+  (and their email marked processed) when the batch result arrives
+- Emails fetched in batches of UIDs (one round-trip per batch, not per message),
+  each batch sent as a compact sequence set (1:250,300)
+- RFC822.SIZE fetched in bulk up front so oversized messages are never downloaded
+- Optional watch mode keeps the sessions open and waits with IMAP IDLE, then
+  processes only UIDs above the last one seen
+- BODYSTRUCTURE inspected first; only qualifying attachment sections are
+  downloaded (BODY.PEEK[n]) and decoded — the full message is fetched and
+  walked as a MIME tree only when the structure cannot be parsed
 """
-import email
-import email.header
+import binascii
+import functools
 import imaplib
+import itertools
 import logging
+import os
+import queue
+import re
+import select
+import socket
+import ssl
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from email.header import decode_header, make_header
 from email.message import Message
-from typing import Generator, Optional
+from email.parser import BytesHeaderParser, BytesParser
+from email.policy import compat32
+from pathlib import Path
+from typing import Generator, Iterator, Optional
 
 from accounts import AccountConfig
-from classifier import InvoiceClassifier
+from classifier import BatchingClassifier, ClassificationResult, InvoiceClassifier
 from extractor import TextExtractor
+from imap_parser import (
+    BodyPart,
+    compress_sequence_set,
+    decode_section,
+    find_item,
+    iter_body_parts,
+    parse_esearch_all,
+    parse_fetch_response,
+)
 from storage import Storage
 from utils import is_allowed_extension
 
@@ -27,11 +62,190 @@ _ALLOWED_EXTENSIONS: set[str] = {".pdf", ".png", ".jpg", ".jpeg", ".docx"}
 _MAX_ATTACHMENT_BYTES: int = 20 * 1024 * 1024  # 20 MB
 _MAX_MESSAGE_BYTES: int = 60 * 1024 * 1024     # pre-screen: skip emails > 60 MB
 _PROGRESS_INTERVAL: int = 50                    # log progress every N emails
+_FETCH_BATCH_SIZE: int = 100                    # UIDs per body UID FETCH command
+_SIZE_BATCH_SIZE: int = 1000                    # UIDs per RFC822.SIZE UID FETCH command
+_WORKER_COUNT: int = 4                          # extraction/classification threads
+_QUEUE_SIZE: int = 32                           # fetched emails buffered for workers
+_HALT_POLL: float = 1.0                         # stop/halt-flag check interval while fetching
+_POOL_SIZE: int = 4                             # concurrent IMAP sessions per account
+_NOOP_INTERVAL: float = 25 * 60                 # keep idle sessions alive (seconds)
+_MAX_RECONNECTS: int = 3                        # per fetch shard, on IMAP4.abort
+_SOCKET_RCVBUF: int = 1 << 20                   # 1 MiB receive buffer for bulk fetches
+_IDLE_TIMEOUT: float = 9 * 60                   # re-issue IDLE before providers drop it
+_IDLE_POLL: float = 1.0                         # stop-flag check interval while idling
+_IDLE_CYCLE: float = 10.0                       # Python 3.14+ idle(): seconds per IDLE command
+_POLL_INTERVAL: float = 5 * 60                  # new-mail check without IDLE support
+
+# imaplib refuses response lines over 1 MB by default; BODYSTRUCTURE lines of
+# messages with many parts (or long encoded filenames) can exceed that.
+imaplib._MAXLINE = 10_000_000
+# IDLE (RFC 2177) is not in imaplib's command table before Python 3.14
+imaplib.Commands.setdefault("IDLE", ("SELECTED",))
+
+_STRUCTURE_ITEMS: str = "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT DATE)])"
+
+# compat32 keeps headers as raw strings instead of eagerly decoding them
+_HEADER_PARSER = BytesHeaderParser(policy=compat32)
+_MESSAGE_PARSER = BytesParser(policy=compat32)
+
+# (idx, uid, subject, date, [(filename, data), …]) handed from fetcher to workers
+_FetchedEmail = tuple[int, bytes, str, str, list[tuple[str, bytes]]]
+
+# FETCH data items, matched in place on the raw response bytes
+_UID_RE = re.compile(rb"\bUID\s+(\d+)")
+_SIZE_RE = re.compile(rb"\bRFC822\.SIZE\s+(\d+)")
+
+
+class IMAPConnectionPool:
+    """
+    Up to *size* authenticated IMAP4_SSL sessions to one account's folder.
+
+    Sessions are opened lazily and handed to one thread at a time through
+    :meth:`connection`.  Idle sessions get a NOOP every ``_NOOP_INTERVAL``
+    seconds so providers that drop quiet connections keep them open; a
+    session that aborts is discarded and replaced on the next request.
+    """
+
+    def __init__(self, account: AccountConfig, size: int = _POOL_SIZE) -> None:
+        self._account = account
+        self.size = size
+        self._idle: list[imaplib.IMAP4_SSL] = []
+        self._open_count = 0
+        self._opened_once = False
+        self._cond = threading.Condition()
+        self._closed = threading.Event()
+        self._keepalive: Optional[threading.Thread] = None
+
+    @contextmanager
+    def connection(self) -> Iterator[imaplib.IMAP4_SSL]:
+        """Borrow a session; it returns to the pool unless it broke."""
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except (imaplib.IMAP4.abort, OSError, KeyboardInterrupt):
+            # An interrupted command leaves its response unread on the wire
+            broken = True
+            raise
+        finally:
+            if broken:
+                self._discard(conn)
+            else:
+                self._release(conn)
+
+    def close(self) -> None:
+        """Log out every idle session and stop the keep-alive thread."""
+        self._closed.set()
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+        for conn in idle:
+            self._logout(conn)
+
+    def _acquire(self) -> imaplib.IMAP4_SSL:
+        with self._cond:
+            while not self._idle and self._open_count >= self.size:
+                self._cond.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._open_count += 1
+        try:
+            conn = self._open()
+        except BaseException:
+            with self._cond:
+                self._open_count -= 1
+                self._cond.notify()
+            raise
+        self._start_keepalive()
+        return conn
+
+    def _release(self, conn: imaplib.IMAP4_SSL) -> None:
+        if self._closed.is_set():
+            with self._cond:
+                self._open_count -= 1
+            self._logout(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn: imaplib.IMAP4_SSL) -> None:
+        with self._cond:
+            self._open_count -= 1
+            self._cond.notify()
+        try:
+            conn.shutdown()
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Error dropping broken IMAP session (non-fatal): %s", exc)
+
+    def _open(self) -> imaplib.IMAP4_SSL:
+        account = self._account
+        conn = imaplib.IMAP4_SSL(account.host, account.port)
+        self._tune_socket(conn.sock)
+        conn.login(account.user, account.password)
+
+        # Quote folder names that contain spaces
+        folder = (
+            f'"{account.folder}"'
+            if " " in account.folder
+            else account.folder
+        )
+        status, msgs = conn.select(folder, readonly=True)
+        if status != "OK":
+            conn.logout()
+            raise RuntimeError(
+                f"Could not select IMAP folder '{account.folder}': {msgs}"
+            )
+        count = msgs[0].decode() if msgs and msgs[0] else "?"
+        log = logger.debug if self._opened_once else logger.info
+        log("Selected folder '%s' (%s messages total)", account.folder, count)
+        self._opened_once = True
+        return conn
+
+    @staticmethod
+    def _tune_socket(sock: socket.socket) -> None:
+        """Disable Nagle and enlarge the receive buffer for multi-MB fetches."""
+        try:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) < _SOCKET_RCVBUF:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCKET_RCVBUF)
+        except OSError as exc:
+            logger.debug("Could not tune IMAP socket options (non-fatal): %s", exc)
+
+    @staticmethod
+    def _logout(conn: imaplib.IMAP4_SSL) -> None:
+        try:
+            conn.close()
+            conn.logout()
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("Error during disconnect (non-fatal): %s", exc)
+
+    def _start_keepalive(self) -> None:
+        with self._cond:
+            if self._keepalive is not None:
+                return
+            self._keepalive = threading.Thread(
+                target=self._keepalive_loop, name="imap-keepalive", daemon=True
+            )
+        self._keepalive.start()
+
+    def _keepalive_loop(self) -> None:
+        while not self._closed.wait(_NOOP_INTERVAL):
+            with self._cond:
+                idle, self._idle = self._idle, []
+            for conn in idle:
+                try:
+                    conn.noop()
+                except (imaplib.IMAP4.error, OSError) as exc:
+                    logger.debug("Idle IMAP session dropped (%s)", exc)
+                    self._discard(conn)
+                else:
+                    self._release(conn)
 
 
 class IMAPClient:
     """
-    Manages an IMAP4_SSL session for a single :class:`~accounts.AccountConfig`.
+    Manages pooled IMAP4_SSL sessions for a single :class:`~accounts.AccountConfig`.
 
     Usage::
 
@@ -39,15 +253,24 @@ class IMAPClient:
             client.process_emails(year=2024, storage=storage)
     """
 
-    def __init__(self, account: AccountConfig) -> None:
+    def __init__(
+        self,
+        account: AccountConfig,
+        use_cache: bool = True,
+        cache_dir: Path = Path("."),
+    ) -> None:
         self._host: str = account.host
         self._port: int = account.port
         self._user: str = account.user
-        self._password: str = account.password
-        self._folder: str = account.folder
-        self._conn: Optional[imaplib.IMAP4_SSL] = None
-        self._extractor = TextExtractor()
-        self._classifier = InvoiceClassifier()
+        self._pool = IMAPConnectionPool(account)
+        # One extraction process per worker thread, so the threads' PDF
+        # parsing and OCR run in parallel rather than on the GIL
+        self._extractor = TextExtractor(
+            max_input_bytes=_MAX_ATTACHMENT_BYTES,
+            processes=min(_WORKER_COUNT, os.cpu_count() or 1),
+        )
+        self._classifier = InvoiceClassifier(use_cache=use_cache, cache_dir=cache_dir)
+        self._batcher: Optional[BatchingClassifier] = None
 
     # ------------------------------------------------------------------
     # Context manager
@@ -59,54 +282,54 @@ class IMAPClient:
 
     def __exit__(self, *_args: object) -> None:
         self._disconnect()
+        self._extractor.close()
 
     # ------------------------------------------------------------------
     # Connection
     # ------------------------------------------------------------------
 
     def _connect(self) -> None:
-        logger.info(f"Connecting to {self._host}:{self._port} as {self._user}")
-        self._conn = imaplib.IMAP4_SSL(self._host, self._port)
-        self._conn.login(self._user, self._password)
-
-        # Quote folder names that contain spaces
-        folder = (
-            f'"{self._folder}"'
-            if " " in self._folder
-            else self._folder
-        )
-        status, msgs = self._conn.select(folder, readonly=True)
-        if status != "OK":
-            raise RuntimeError(
-                f"Could not select IMAP folder '{self._folder}': {msgs}"
-            )
-        count = msgs[0].decode() if msgs and msgs[0] else "?"
-        logger.info(f"Selected folder '{self._folder}' ({count} messages total)")
+        logger.info("Connecting to %s:%s as %s", self._host, self._port, self._user)
+        # Open the first session eagerly so bad credentials fail fast
+        with self._pool.connection():
+            pass
 
     def _disconnect(self) -> None:
-        if self._conn:
-            try:
-                self._conn.close()
-                self._conn.logout()
-                logger.debug("IMAP connection closed")
-            except Exception as exc:  # noqa: BLE001
-                logger.debug(f"Error during disconnect (non-fatal): {exc}")
-            finally:
-                self._conn = None
+        self._pool.close()
+        logger.debug("IMAP connections closed")
 
     # ------------------------------------------------------------------
     # Search
     # ------------------------------------------------------------------
 
-    def _search_uids(self, year: int) -> list[bytes]:
-        """Return all UIDs for emails sent in the given calendar year."""
+    def _search_uids(self, year: int, min_uid: int = 1) -> list[bytes]:
+        """Return the UIDs (from *min_uid* up) for emails sent in the given calendar year."""
         since = f"01-Jan-{year}"
         before = f"01-Jan-{year + 1}"
         criteria = f"SINCE {since} BEFORE {before}"
-        logger.debug(f"IMAP UID SEARCH: {criteria}")
+        if min_uid > 1:
+            criteria = f"UID {min_uid}:* {criteria}"
+        logger.debug("IMAP UID SEARCH: %s", criteria)
+        uids = self._run_search(criteria)
+        if min_uid > 1:
+            # "n:*" always includes the highest UID, even when it is below n
+            uids = [uid for uid in uids if int(uid) >= min_uid]
+        return uids
 
-        assert self._conn is not None
-        typ, data = self._conn.uid("search", None, criteria)
+    def _run_search(self, criteria: str) -> list[bytes]:
+        with self._pool.connection() as conn:
+            if "ESEARCH" in conn.capabilities:
+                # RFC 4731: the matches come back as one compact sequence set
+                # (1:500,502,…) instead of every UID spelled out
+                typ, _ = conn.uid("search", "RETURN (ALL)", criteria)
+                _, data = conn.response("ESEARCH")
+                if typ == "OK":
+                    try:
+                        return parse_esearch_all(data)
+                    except ValueError as exc:
+                        raise RuntimeError(f"Unparseable ESEARCH response: {exc}") from exc
+            else:
+                typ, data = conn.uid("search", None, criteria)
         if typ != "OK":
             raise RuntimeError(f"UID SEARCH failed — server returned: {typ}")
 
@@ -118,108 +341,674 @@ class IMAPClient:
     # Main processing loop
     # ------------------------------------------------------------------
 
-    def process_emails(self, year: int, storage: Storage) -> None:
+    def process_emails(
+        self,
+        year: int,
+        storage: Storage,
+        min_uid: int = 1,
+        stop: Optional[threading.Event] = None,
+    ) -> int:
         """
-        Iterate every email UID in *year*, skip already-processed ones,
-        and coordinate attachment extraction and classification.
+        Iterate every email UID in *year* (from *min_uid* up), skip
+        already-processed ones, and coordinate attachment extraction and
+        classification.
+
+        Setting *stop* ends the scan early: fetching stops, queued emails are
+        left unprocessed (they are picked up by the next run) and the
+        classifications already in flight are saved before returning.
+
+        Returns the highest UID found, or ``min_uid - 1`` when there was none,
+        so a later call can pick up only newer mail.
         """
-        uids = self._search_uids(year)
-        total = len(uids)
-        logger.info(f"Found {total} email(s) in {year} to inspect")
+        uids = self._search_uids(year, min_uid)
+        newest = max((int(uid) for uid in uids), default=min_uid - 1)
+        log = logger.info if uids or min_uid == 1 else logger.debug
+        log("Found %d email(s) in %d to inspect", len(uids), year)
 
-        for idx, uid in enumerate(uids, 1):
-            uid_str = uid.decode()
+        # Filter before any FETCH so processed UIDs cost no server work
+        processed = storage.load_processed_set()
+        pending = [uid for uid in uids if uid not in processed]
+        if len(pending) < len(uids):
+            logger.info(
+                "%d email(s) already processed — skipping",
+                len(uids) - len(pending),
+            )
+
+        # Pre-screen by message size so huge messages are never downloaded
+        with self._pool.connection() as conn:
+            sizes = self._fetch_sizes_bulk(conn, pending)
+        ok: list[bytes] = []
+        oversized: list[bytes] = []
+        for uid in pending:
+            (oversized if sizes.get(uid, 0) > _MAX_MESSAGE_BYTES else ok).append(uid)
+        if oversized:
+            logger.warning(
+                "Skipping %d email(s) larger than %d MB: UIDs %s",
+                len(oversized),
+                _MAX_MESSAGE_BYTES // 1024 // 1024,
+                b', '.join(oversized).decode(),
+            )
+            for uid in oversized:
+                storage.mark_processed(uid)
+        if not ok:
+            return newest
+        total = len(ok)
 
-            if storage.is_processed(uid_str):
-                logger.debug(f"[{idx}/{total}] UID {uid_str} already processed — skipping")
+        # Each shard of UIDs is fetched over its own pooled connection and
+        # feeds one bounded queue; workers extract text and submit it to the
+        # batching classifier, whose results arrive asynchronously.
+        shards = self._shard(ok)
+        counter = itertools.count(1)
+        work: queue.Queue[Optional[_FetchedEmail]] = queue.Queue(maxsize=_QUEUE_SIZE)
+        # Tells fetchers to stop queueing once the workers are being shut down
+        halt = threading.Event()
+        stop = stop if stop is not None else threading.Event()
+        self._batcher = BatchingClassifier(self._classifier)
+        try:
+            with ThreadPoolExecutor(
+                max_workers=_WORKER_COUNT, thread_name_prefix="mail-worker"
+            ) as pool:
+                workers = [
+                    pool.submit(self._consume, work, total, storage, stop)
+                    for _ in range(_WORKER_COUNT)
+                ]
+                try:
+                    with ThreadPoolExecutor(
+                        max_workers=len(shards), thread_name_prefix="imap-fetch"
+                    ) as fetch_pool:
+                        fetchers = [
+                            fetch_pool.submit(
+                                self._fetch_shard,
+                                shard, work, counter, total, storage, halt,
+                            )
+                            for shard in shards
+                        ]
+                        # Poll instead of blocking so *stop* reaches the fetchers
+                        try:
+                            while wait(fetchers, timeout=_HALT_POLL).not_done:
+                                if stop.is_set():
+                                    halt.set()
+                        except BaseException:
+                            # Ctrl-C: the pool's exit would otherwise join
+                            # fetchers that keep going
+                            halt.set()
+                            raise
+                    for fetcher in fetchers:
+                        fetcher.result()
+                finally:
+                    # On Ctrl-C the fetchers are still running; without the
+                    # flag they would block forever on a queue nobody drains.
+                    halt.set()
+                    # One sentinel per worker; queued emails are still drained first
+                    for _ in workers:
+                        work.put(None)
+            for worker in workers:
+                worker.result()
+        finally:
+            # Drain outstanding classifications so every invoice is saved
+            self._batcher.close()
+            self._batcher = None
+        return newest
+
+    # ------------------------------------------------------------------
+    # Watch mode
+    # ------------------------------------------------------------------
+
+    def watch(
+        self,
+        year: int,
+        storage: Storage,
+        stop: threading.Event,
+        last_uid: int = 0,
+    ) -> None:
+        """
+        Process new mail in *year* as it arrives, until *stop* is set.
+
+        Waits with IMAP IDLE where the server supports it (polling every
+        ``_POLL_INTERVAL`` seconds otherwise).  After every wake-up only UIDs
+        above *last_uid* are searched and processed, and the summary CSV is
+        rewritten when something new was found.  A failed cycle is logged and
+        retried after ``_POLL_INTERVAL`` seconds; lost connections are
+        reopened then.
+        """
+        logger.info("Watching %s for new mail", self._user)
+        while not stop.is_set():
+            try:
+                self._wait_for_mail(stop)
+                if stop.is_set():
+                    break
+                newest = self.process_emails(
+                    year, storage, min_uid=last_uid + 1, stop=stop
+                )
+                if newest > last_uid:
+                    last_uid = newest
+                    storage.write_summary()
+            except Exception as exc:
+                # The daemon must outlive any single failed cycle
+                logger.warning(
+                    "Watch cycle failed (%s) — retrying in %.0fs",
+                    exc, _POLL_INTERVAL, exc_info=True,
+                )
+                stop.wait(_POLL_INTERVAL)
+
+    def _wait_for_mail(self, stop: threading.Event) -> None:
+        """Return once the server reports new mail, after a timeout, or on *stop*."""
+        with self._pool.connection() as conn:
+            if "IDLE" not in conn.capabilities:
+                conn.noop()
+                stop.wait(_POLL_INTERVAL)
+                return
+            self._idle(conn, stop)
+
+    @staticmethod
+    def _idle(conn: imaplib.IMAP4_SSL, stop: threading.Event) -> None:
+        """
+        Hold *conn* in IDLE until an EXISTS update, ``_IDLE_TIMEOUT`` or *stop*.
+
+        Python 3.14+ provides :meth:`imaplib.IMAP4.idle`; it is re-entered
+        every ``_IDLE_CYCLE`` seconds so *stop* is noticed.  Older versions
+        drive IDLE through imaplib's private command/response methods, which
+        is why all of that handling stays in this one place.
+        """
+        # Status updates left over from earlier commands must not end the wait
+        for name in ("EXISTS", "RECENT", "EXPUNGE"):
+            conn.response(name)
+        deadline = time.monotonic() + _IDLE_TIMEOUT
+
+        if sys.version_info >= (3, 14):
+            while not stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                with conn.idle(duration=min(_IDLE_CYCLE, remaining)) as idler:
+                    if any(typ == "EXISTS" for typ, _data in idler):
+                        return
+            return
+
+        def peek() -> Optional[bytes]:
+            # Bytes may sit in the reader's buffer or in SSL's decrypted
+            # buffer, where select cannot see them; peek without blocking.
+            # b"" means nothing buffered (or EOF), None a partial SSL record.
+            timeout = conn.sock.gettimeout()
+            conn.sock.setblocking(False)
+            try:
+                return conn.file.peek()
+            except (BlockingIOError, ssl.SSLWantReadError):
+                return None
+            finally:
+                conn.sock.settimeout(timeout)
+
+        tag = conn._command("IDLE")
+        # The server either accepts with a "+" continuation or refuses
+        # with a tagged NO/BAD; untagged data may come first.
+        while conn._get_response() is not None:
+            if conn.tagged_commands.get(tag) is not None:
+                typ, data = conn.tagged_commands.pop(tag)
+                raise imaplib.IMAP4.error(f"IDLE refused: {typ} {data}")
+        while not stop.is_set() and time.monotonic() < deadline:
+            if not peek():
+                # A socket select reports readable that still yields no
+                # bytes was closed by the server; spinning on it would
+                # burn CPU until the deadline.
+                if select.select([conn.sock], [], [], _IDLE_POLL)[0] and peek() == b"":
+                    raise imaplib.IMAP4.abort("EOF during IDLE")
+                continue
+            # One packet can carry several updates (e.g. EXPUNGE + EXISTS)
+            while peek():
+                conn._get_response()
+            if "EXISTS" in conn.untagged_responses:
+                break
+        conn.send(b"DONE\r\n")
+        conn._command_complete("IDLE", tag)
+        # Mailbox status updates are not needed once the search has run
+        for name in ("EXISTS", "RECENT", "EXPUNGE"):
+            conn.response(name)
+
+    def _shard(self, uids: list[bytes]) -> list[list[bytes]]:
+        """Split *uids* into contiguous shards, one per pooled connection."""
+        count = min(self._pool.size, -(-len(uids) // _FETCH_BATCH_SIZE))
+        step = -(-len(uids) // count)
+        return [uids[i:i + step] for i in range(0, len(uids), step)]
+
+    def _fetch_shard(
+        self,
+        uids: list[bytes],
+        work: "queue.Queue[Optional[_FetchedEmail]]",
+        counter: "itertools.count[int]",
+        total: int,
+        storage: Storage,
+        halt: threading.Event,
+    ) -> None:
+        """
+        Fetch every email in *uids* over one pooled connection and queue it
+        for the workers, reconnecting when the server drops the session.
+        Returns early once *halt* is set.
+        """
+        pos = 0
+        reconnects = 0
+        while pos < len(uids) and not halt.is_set():
+            try:
+                with self._pool.connection() as conn:
+                    for uid, fields in self._fetch_structures(conn, uids[pos:]):
+                        if halt.is_set():
+                            return
+                        self._queue_email(
+                            conn, uid, fields, work, counter, total, storage, halt
+                        )
+                        pos += 1
+            except imaplib.IMAP4.abort as exc:
+                reconnects += 1
+                if reconnects > _MAX_RECONNECTS:
+                    raise
+                logger.warning("IMAP connection lost (%s) — reconnecting", exc)
+
+    def _queue_email(
+        self,
+        conn: imaplib.IMAP4_SSL,
+        uid: bytes,
+        fields: Optional[dict],
+        work: "queue.Queue[Optional[_FetchedEmail]]",
+        counter: "itertools.count[int]",
+        total: int,
+        storage: Storage,
+        halt: threading.Event,
+    ) -> None:
+        try:
+            fetched = self._fetch_email(conn, uid, fields)
+        except imaplib.IMAP4.abort:
+            raise
+        except Exception as exc:
+            logger.error(
+                "Unhandled error for UID %s: %s", uid.decode(), exc, exc_info=True
+            )
+            storage.increment_errors()
+            fetched = None
+        if fetched is None:
+            storage.mark_processed(uid)
+            return
+        item = (next(counter), uid, *fetched)
+        # Bounded waits so a halted fetcher never blocks on a full queue
+        while not halt.is_set():
+            try:
+                work.put(item, timeout=_HALT_POLL)
+                return
+            except queue.Full:
                 continue
 
+    def _consume(
+        self,
+        work: "queue.Queue[Optional[_FetchedEmail]]",
+        total: int,
+        storage: Storage,
+        stop: threading.Event,
+    ) -> None:
+        """
+        Worker loop: handle fetched emails until the ``None`` sentinel.
+
+        Once *stop* is set the remaining items are dropped unprocessed; the
+        queue is still drained so the fetchers and the sentinel get through.
+        """
+        while (item := work.get()) is not None:
+            if stop.is_set():
+                continue
+            idx, uid, subject, email_date, attachments = item
+            pending: list[Future] = []
             try:
-                self._process_single_email(uid=uid, uid_str=uid_str, storage=storage)
+                pending = self._process_single_email(
+                    uid=uid,
+                    subject=subject,
+                    email_date=email_date,
+                    attachments=attachments,
+                    storage=storage,
+                )
             except Exception as exc:
                 logger.error(
-                    f"[{idx}/{total}] Unhandled error for UID {uid_str}: {exc}",
+                    "[%d/%d] Unhandled error for UID %s: %s",
+                    idx, total, uid.decode(), exc,
                     exc_info=True,
                 )
                 storage.increment_errors()
             finally:
-                # Always mark as processed so we never re-fetch this UID
-                storage.mark_processed(uid_str)
+                # Always mark as processed so we never re-fetch this UID — but
+                # only once its attachments are classified (and saved)
+                self._mark_when_done(uid, pending, storage)
 
             if idx % _PROGRESS_INTERVAL == 0:
                 logger.info(
-                    f"Progress {idx}/{total} — "
-                    f"invoices: {storage.invoice_count} | "
-                    f"errors: {storage.error_count}"
+                    "Progress %d/%d — invoices: %d | errors: %d",
+                    idx, total, storage.invoice_count, storage.error_count,
                 )
 
+    @staticmethod
+    def _mark_when_done(uid: bytes, pending: list[Future], storage: Storage) -> None:
+        """Mark *uid* processed after every future in *pending* has resolved."""
+        if not pending:
+            storage.mark_processed(uid)
+            return
+        remaining = itertools.count(len(pending) - 1, -1)
+        lock = threading.Lock()
+
+        def done(_future: Future) -> None:
+            with lock:
+                last = next(remaining) == 0
+            if last:
+                storage.mark_processed(uid)
+
+        for future in pending:
+            future.add_done_callback(done)
+
     # ------------------------------------------------------------------
-    # Single-email handling
+    # Batched fetch
     # ------------------------------------------------------------------
 
-    def _process_single_email(
-        self, uid: bytes, uid_str: str, storage: Storage
-    ) -> None:
-        assert self._conn is not None
+    def _uid_fetch_chunks(
+        self,
+        conn: imaplib.IMAP4_SSL,
+        uids: list[bytes],
+        items: str,
+        batch_size: int,
+    ) -> Generator[tuple[list[bytes], list], None, None]:
+        """
+        Issue ``UID FETCH <set> <items>`` for *uids*, *batch_size* at a time.
 
-        # 1. Pre-screen by message size to avoid downloading huge messages
-        size = self._fetch_size(uid)
-        if size is not None and size > _MAX_MESSAGE_BYTES:
-            logger.warning(
-                f"UID {uid_str}: message is {size // 1024 // 1024} MB "
-                f"(limit {_MAX_MESSAGE_BYTES // 1024 // 1024} MB) — skipping"
-            )
-            return
+        Yields ``(chunk, data)`` per command so the caller pays one
+        round-trip per batch instead of one per message.  When the server
+        rejects a command as too large, the batch is halved and retried; a
+        single UID that is still rejected is yielded with empty *data*.
+        """
+        start = 0
+        while start < len(uids):
+            chunk = uids[start:start + batch_size]
+            try:
+                typ, data = conn.uid(
+                    "fetch", compress_sequence_set(chunk).decode(), items
+                )
+            except imaplib.IMAP4.abort:
+                raise
+            except imaplib.IMAP4.error as exc:
+                if len(chunk) > 1:
+                    batch_size = max(1, len(chunk) // 2)
+                    logger.warning(
+                        "UID FETCH of %d message(s) rejected (%s) — "
+                        "retrying with batches of %d",
+                        len(chunk), exc, batch_size,
+                    )
+                    continue
+                logger.warning("UID %s: fetch rejected — %s", chunk[0].decode(), exc)
+                typ, data = "NO", []
+            start += len(chunk)
 
-        # 2. Fetch full message
-        typ, data = self._conn.uid("fetch", uid, "(RFC822)")
-        if typ != "OK" or not data or data[0] is None:
-            logger.warning(f"UID {uid_str}: fetch failed — {typ}")
-            return
+            if typ != "OK":
+                logger.warning(
+                    "UID FETCH %s failed — server returned: %s", items, typ
+                )
+                data = []
+            yield chunk, data
 
-        raw = data[0][1]
-        if not isinstance(raw, bytes):
-            logger.warning(f"UID {uid_str}: unexpected fetch payload type")
-            return
+    def _fetch_sizes_bulk(
+        self, conn: imaplib.IMAP4_SSL, uids: list[bytes]
+    ) -> dict[bytes, int]:
+        """Return UID → RFC822.SIZE for *uids* without downloading any body."""
+        sizes: dict[bytes, int] = {}
+        for _chunk, data in self._uid_fetch_chunks(
+            conn, uids, "(RFC822.SIZE)", _SIZE_BATCH_SIZE
+        ):
+            # One response line per message; the items may come in any order
+            # and with others (e.g. MODSEQ) in between.
+            for line in data:
+                if not isinstance(line, bytes):
+                    continue
+                uid_match = _UID_RE.search(line)
+                size_match = _SIZE_RE.search(line)
+                if uid_match and size_match:
+                    sizes[uid_match.group(1)] = int(size_match.group(1))
+        return sizes
+
+    def _fetch_structures(
+        self, conn: imaplib.IMAP4_SSL, uids: list[bytes]
+    ) -> Generator[tuple[bytes, Optional[dict]], None, None]:
+        """
+        Yield ``(uid, fields)`` with the BODYSTRUCTURE and Subject/Date header
+        block of every UID, fetched in batches.
+
+        *fields* is ``None`` when the server did not return the message or the
+        response could not be parsed; the caller then falls back to a full fetch.
+        """
+        for chunk, data in self._uid_fetch_chunks(
+            conn, uids, _STRUCTURE_ITEMS, _FETCH_BATCH_SIZE
+        ):
+            try:
+                fetched = parse_fetch_response(data)
+            except ValueError as exc:
+                logger.warning(
+                    "Could not parse BODYSTRUCTURE response (%s) — "
+                    "falling back to full fetch for %d email(s)",
+                    exc, len(chunk),
+                )
+                fetched = {}
+            for uid in chunk:
+                yield uid, fetched.get(uid)
+
+    def _fetch_message(self, conn: imaplib.IMAP4_SSL, uid: bytes) -> Optional[bytes]:
+        """Fetch the complete RFC822 message for *uid*."""
+        for _uid, raw in self._fetch_batch(conn, [uid]):
+            return raw
+        return None
+
+    def _fetch_batch(
+        self,
+        conn: imaplib.IMAP4_SSL,
+        uids: list[bytes],
+        batch_size: int = _FETCH_BATCH_SIZE,
+    ) -> Generator[tuple[bytes, Optional[bytes]], None, None]:
+        """
+        Yield ``(uid, raw)`` for every UID in *uids*, in order.
+
+        UIDs the server does not return (e.g. deleted meanwhile) are yielded
+        with ``raw=None``.
+        """
+        for chunk, data in self._uid_fetch_chunks(conn, uids, "(RFC822)", batch_size):
+            fetched = self._parse_fetch_response(data)
+            for uid in chunk:
+                yield uid, fetched.get(uid)
+
+    @staticmethod
+    def _parse_fetch_response(data: list) -> dict[bytes, bytes]:
+        """
+        Map UID → literal payload from an imaplib ``UID FETCH`` response.
 
-        msg = email.message_from_bytes(raw)
+        Each message arrives as a ``(header, literal)`` tuple followed by a
+        closing ``b")"``; items the server sent after the literal (such as a
+        trailing ``UID n``) end up in that closing element instead.
+        """
+        result: dict[bytes, bytes] = {}
+        for pos, item in enumerate(data):
+            if not isinstance(item, tuple) or not isinstance(item[1], bytes):
+                continue
+            meta = item[0]
+            if pos + 1 < len(data) and isinstance(data[pos + 1], bytes):
+                meta += data[pos + 1]
+            uid_match = _UID_RE.search(meta)
+            if uid_match is not None:
+                result[uid_match.group(1)] = item[1]
+        return result
+
+    # ------------------------------------------------------------------
+    # Single-email handling
+    # ------------------------------------------------------------------
+
+    def _fetch_email(
+        self,
+        conn: imaplib.IMAP4_SSL,
+        uid: bytes,
+        fields: Optional[dict],
+    ) -> Optional[tuple[str, str, list[tuple[str, bytes]]]]:
+        """
+        Download what the workers need for one email:
+        ``(subject, date, [(filename, data), …])``, or ``None`` if the fetch failed.
+        """
+        # 1. Locate attachments from the BODYSTRUCTURE when it is usable
+        parts: Optional[list[BodyPart]] = None
+        structure = fields.get(b"BODYSTRUCTURE") if fields else None
+        if isinstance(structure, list):
+            try:
+                parts = list(iter_body_parts(structure))
+            except ValueError as exc:
+                logger.debug(
+                    "UID %s: %s — falling back to full fetch", uid.decode(), exc
+                )
+
+        if parts is not None:
+            header = find_item(fields, b"BODY[HEADER") if fields else None
+            msg = self._parse_headers(header if isinstance(header, bytes) else b"")
+            attachments = list(
+                self._iter_structure_attachments(conn, uid, parts)
+            )
+        else:
+            # Fallback: download the whole message and walk the MIME tree
+            raw = self._fetch_message(conn, uid)
+            if raw is None:
+                logger.warning(
+                    "UID %s: fetch failed — no message data returned", uid.decode()
+                )
+                return None
+            msg = _MESSAGE_PARSER.parsebytes(raw)
+            attachments = list(self._iter_attachments(msg))
 
         subject = self._decode_header_value(str(msg.get("Subject", "(no subject)")))
         email_date = str(msg.get("Date", ""))
+        return subject, email_date, attachments
 
-        # 3. Walk MIME parts, yield qualifying attachments
+    def _process_single_email(
+        self,
+        uid: bytes,
+        subject: str,
+        email_date: str,
+        attachments: list[tuple[str, bytes]],
+        storage: Storage,
+    ) -> list[Future]:
+        """Submit every attachment for classification; return the pending futures."""
+        pending: list[Future] = []
         found_attachments = False
-        for attach_filename, attach_data in self._iter_attachments(msg):
+        texts = self._extractor.extract_many(attachments) if attachments else []
+        for (attach_filename, attach_data), text in zip(attachments, texts):
             found_attachments = True
             storage.increment_attachments()
-            logger.info(
-                f"UID {uid_str} | attachment '{attach_filename}' "
-                f"({len(attach_data) // 1024} KB) | subject: {subject[:60]!r}"
-            )
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(
+                    "UID %s | attachment '%s' (%d KB) | subject: %r",
+                    uid.decode(), attach_filename, len(attach_data) // 1024, subject[:60],
+                )
             try:
-                self._handle_attachment(
+                future = self._handle_attachment(
                     filename=attach_filename,
                     data=attach_data,
+                    text=text,
                     email_subject=subject,
                     email_date=email_date,
                     storage=storage,
                 )
+                if future is not None:
+                    pending.append(future)
             except Exception as exc:
                 logger.error(
-                    f"UID {uid_str}: error handling '{attach_filename}': {exc}",
+                    "UID %s: error handling '%s': %s",
+                    uid.decode(), attach_filename, exc,
                     exc_info=True,
                 )
                 storage.increment_errors()
 
         if not found_attachments:
-            logger.debug(f"UID {uid_str}: no qualifying attachments")
+            logger.debug("UID %s: no qualifying attachments", uid.decode())
 
         storage.increment_processed()
+        return pending
 
     # ------------------------------------------------------------------
     # Attachment iteration
     # ------------------------------------------------------------------
 
+    def _iter_structure_attachments(
+        self,
+        conn: imaplib.IMAP4_SSL,
+        uid: bytes,
+        parts: list[BodyPart],
+    ) -> Generator[tuple[str, bytes], None, None]:
+        """
+        Yield ``(filename, raw_bytes)`` for qualifying attachments described
+        by a BODYSTRUCTURE, downloading only their sections in one fetch.
+        """
+        selected: list[tuple[str, BodyPart]] = []
+        for part in parts:
+            filename = self._get_part_filename(part.headers)
+            if not filename:
+                continue
+
+            if not is_allowed_extension(filename, _ALLOWED_EXTENSIONS):
+                logger.debug("Extension not allowed: %r", filename)
+                continue
+
+            if part.decoded_size > _MAX_ATTACHMENT_BYTES:
+                logger.warning(
+                    "Attachment '%s' is %d MB — exceeds 20 MB limit, skipping",
+                    filename, part.decoded_size // 1024 // 1024,
+                )
+                continue
+
+            selected.append((filename, part))
+
+        if not selected:
+            return
+
+        # Partial fetches cap the bytes on the wire even if the server's
+        # BODYSTRUCTURE understated a part's size.
+        limits = {
+            part.section: part.encoded_limit(_MAX_ATTACHMENT_BYTES)
+            for _, part in selected
+        }
+        items = " ".join(
+            f"BODY.PEEK[{section}]<0.{limit + 1}>" for section, limit in limits.items()
+        )
+        typ, data = conn.uid("fetch", uid.decode(), f"({items})")
+        if typ != "OK":
+            logger.warning("UID %s: attachment fetch failed — %s", uid.decode(), typ)
+            return
+        sections = parse_fetch_response(data).get(uid, {})
+
+        for filename, part in selected:
+            # Partial responses are labelled BODY[<section>]<0>
+            encoded = find_item(sections, f"BODY[{part.section}]".encode())
+            if not isinstance(encoded, bytes) or not encoded:
+                logger.debug(
+                    "Empty or missing section %s for '%s'", part.section, filename
+                )
+                continue
+
+            if len(encoded) > limits[part.section]:
+                logger.warning(
+                    "Attachment '%s' is larger than announced "
+                    "— exceeds 20 MB limit, skipping",
+                    filename,
+                )
+                continue
+
+            try:
+                payload = decode_section(encoded, part.encoding)
+            except (binascii.Error, ValueError) as exc:
+                logger.warning(
+                    "Could not decode '%s' (%s): %s", filename, part.encoding, exc
+                )
+                continue
+
+            if len(payload) > _MAX_ATTACHMENT_BYTES:
+                logger.warning(
+                    "Attachment '%s' is %d MB — exceeds 20 MB limit, skipping",
+                    filename, len(payload) // 1024 // 1024,
+                )
+                continue
+
+            yield filename, payload
+
     def _iter_attachments(
         self, msg: Message
     ) -> Generator[tuple[str, bytes], None, None]:
@@ -230,7 +1019,8 @@ class IMAPClient:
           - does not exceed the size limit
         """
         for part in msg.walk():
-            if part.get_content_maintype() == "multipart":
+            # Containers and body text never carry an invoice attachment
+            if part.get_content_maintype() in ("multipart", "message", "text"):
                 continue
 
             filename = self._get_part_filename(part)
@@ -238,18 +1028,40 @@ class IMAPClient:
                 continue
 
             if not is_allowed_extension(filename, _ALLOWED_EXTENSIONS):
-                logger.debug(f"Extension not allowed: {filename!r}")
+                logger.debug("Extension not allowed: %r", filename)
+                continue
+
+            # Size-check the encoded payload before paying for the decode
+            encoding = str(part.get("Content-Transfer-Encoding", "7bit")).strip().lower()
+            encoded = part.get_payload(decode=False)
+            if not isinstance(encoded, str) or not encoded:
+                logger.debug("Empty or non-bytes payload for '%s'", filename)
+                continue
+            approx_size = len(encoded) * 3 // 4 if encoding == "base64" else len(encoded)
+            if approx_size > _MAX_ATTACHMENT_BYTES:
+                logger.warning(
+                    "Attachment '%s' is %d MB — exceeds 20 MB limit, skipping",
+                    filename, approx_size // 1024 // 1024,
+                )
                 continue
 
-            payload = part.get_payload(decode=True)
+            if encoding in ("base64", "quoted-printable"):
+                try:
+                    payload = decode_section(
+                        encoded.encode("ascii", errors="surrogateescape"), encoding
+                    )
+                except (binascii.Error, ValueError):
+                    payload = part.get_payload(decode=True)
+            else:
+                payload = part.get_payload(decode=True)
             if not isinstance(payload, bytes) or not payload:
-                logger.debug(f"Empty or non-bytes payload for '{filename}'")
+                logger.debug("Empty or non-bytes payload for '%s'", filename)
                 continue
 
             if len(payload) > _MAX_ATTACHMENT_BYTES:
                 logger.warning(
-                    f"Attachment '{filename}' is {len(payload) // 1024 // 1024} MB "
-                    f"— exceeds 20 MB limit, skipping"
+                    "Attachment '%s' is %d MB — exceeds 20 MB limit, skipping",
+                    filename, len(payload) // 1024 // 1024,
                 )
                 continue
 
@@ -283,63 +1095,96 @@ class IMAPClient:
         self,
         filename: str,
         data: bytes,
+        text: Optional[str],
         email_subject: str,
         email_date: str,
         storage: Storage,
-    ) -> None:
-        """Extract text → classify → save if invoice."""
-        text = self._extractor.extract(filename=filename, data=data)
+    ) -> Optional[Future]:
+        """
+        Submit the attachment's extracted *text* for classification.
+
+        Returns the classification future; the invoice is saved by a done
+        callback, so the worker moves on without waiting for the API.
+        """
         if not text:
-            logger.warning(f"No text extracted from '{filename}' — cannot classify")
+            logger.warning("No text extracted from '%s' — cannot classify", filename)
+            return None
+
+        future = self._batcher.submit(text)
+        future.add_done_callback(
+            functools.partial(
+                self._on_classified, filename, data, email_subject, email_date, storage
+            )
+        )
+        return future
+
+    @staticmethod
+    def _on_classified(
+        filename: str,
+        data: bytes,
+        email_subject: str,
+        email_date: str,
+        storage: Storage,
+        future: "Future[Optional[ClassificationResult]]",
+    ) -> None:
+        """Save the attachment if its classification says it is an invoice."""
+        # Runs on a classifier thread, so nothing may propagate out of here
+        try:
+            result = future.result()
+        except Exception as exc:
+            logger.error("Classification failed for '%s': %s", filename, exc, exc_info=True)
+            storage.increment_errors()
             return
 
-        result = self._classifier.classify(text=text)
         if result is None:
-            logger.warning(f"Classification returned None for '{filename}' — skipping")
+            logger.warning(
+                "Classification returned None for '%s' — skipping", filename
+            )
             return
 
         if not result.is_invoice:
-            logger.debug(f"'{filename}' → not an invoice")
+            logger.debug("'%s' → not an invoice", filename)
             return
 
         logger.info(
-            f"Invoice confirmed: vendor={result.vendor!r}  "
-            f"number={result.invoice_number!r}  "
-            f"date={result.date}  "
-            f"amount={result.total_amount} {result.currency}"
+            "Invoice confirmed: vendor=%r  number=%r  date=%s  amount=%s %s",
+            result.vendor,
+            result.invoice_number,
+            result.date,
+            result.total_amount,
+            result.currency,
         )
 
-        storage.save_invoice(
-            filename=filename,
-            data=data,
-            classification=result,
-            email_subject=email_subject,
-            email_date=email_date,
-        )
+        try:
+            storage.save_invoice(
+                filename=filename,
+                data=data,
+                classification=result,
+                email_subject=email_subject,
+                email_date=email_date,
+            )
+        except Exception as exc:
+            logger.error("Error saving '%s': %s", filename, exc, exc_info=True)
+            storage.increment_errors()
 
     # ------------------------------------------------------------------
     # Helpers
     # ------------------------------------------------------------------
 
-    def _fetch_size(self, uid: bytes) -> Optional[int]:
-        """Fetch only the RFC822.SIZE of an email (cheap, no body download)."""
-        assert self._conn is not None
-        typ, data = self._conn.uid("fetch", uid, "(RFC822.SIZE)")
-        if typ != "OK" or not data or not data[0]:
-            return None
-        try:
-            # Response: b'<uid> (RFC822.SIZE <n>)'
-            token = data[0].decode()
-            return int(token.split("RFC822.SIZE")[1].strip().rstrip(")").split()[0])
-        except (IndexError, ValueError):
-            return None
+    @staticmethod
+    def _parse_headers(raw: bytes) -> Message:
+        """Parse only the header block of *raw*; the body is never scanned."""
+        end = raw.find(b"\r\n\r\n")
+        return _HEADER_PARSER.parsebytes(raw if end < 0 else raw[:end + 2])
 
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def _decode_header_value(raw: str) -> str:
         """Decode an RFC 2047-encoded header value to a plain string."""
+        # Most headers are plain ASCII with no encoded words at all
+        if "=?" not in raw:
+            return raw
         try:
-            from email.header import decode_header, make_header
-
             return str(make_header(decode_header(raw)))
         except Exception:
             return raw
@@ -0,0 +1,343 @@
+"""
+IMAP response parsing: FETCH responses and BODYSTRUCTURE trees.
+
+imaplib hands back FETCH responses as a flat list of raw lines, with every
+literal split out into a ``(line, literal)`` tuple.  This module reassembles
+that list, parses the parenthesized data into nested Python lists, and walks
+BODYSTRUCTURE trees so the client can fetch individual body sections instead
+of whole messages.
+
+Parsed values:
+  - atoms and strings  → ``bytes``
+  - NIL                → ``None``
+  - parenthesized list → ``list``
+"""
+import base64
+import quopri
+from dataclasses import dataclass
+from email.message import Message
+from typing import Generator, Union
+
+_WHITESPACE = frozenset(b" \t\r\n")
+_ATOM_DELIMITERS = frozenset(b" \t\r\n()")
+
+Token = Union[bytes, None, list]
+
+
+# ---------------------------------------------------------------------------
+# Data model
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True, slots=True)
+class BodyPart:
+    """A leaf (non-multipart) body part described by a BODYSTRUCTURE."""
+
+    section: str      # e.g. "2" or "1.2", as used in BODY.PEEK[<section>]
+    maintype: str
+    subtype: str
+    encoding: str     # Content-Transfer-Encoding, lowercase
+    size: int         # encoded size in octets
+    headers: Message  # Content-Type / Content-Disposition rebuilt from params
+
+    @property
+    def decoded_size(self) -> int:
+        """Approximate size of the part after transfer decoding."""
+        if self.encoding == "base64":
+            return self.size * 3 // 4
+        return self.size
+
+    def encoded_limit(self, decoded_limit: int) -> int:
+        """Most encoded octets that can decode to at most *decoded_limit* bytes."""
+        if self.encoding == "base64":
+            chars = -(-decoded_limit // 3) * 4
+            return chars + 2 * -(-chars // 60)  # CRLF per line of >= 60 chars
+        if self.encoding == "quoted-printable":
+            return decoded_limit * 4  # =XX escapes plus soft line breaks
+        return decoded_limit
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------------
+
+
+def parse_tokens(buf: bytes) -> list[Token]:
+    """
+    Parse IMAP response data into nested lists.
+
+    *buf* must be reassembled imaplib output (see :func:`join_response`):
+    each ``{n}`` literal marker is followed directly by its *n* octets.
+
+    Raises ValueError on malformed input.
+    """
+    stack: list[list[Token]] = [[]]
+    pos, end = 0, len(buf)
+    while pos < end:
+        char = buf[pos]
+        if char in _WHITESPACE:
+            pos += 1
+        elif char == 0x28:  # (
+            nested: list[Token] = []
+            stack[-1].append(nested)
+            stack.append(nested)
+            pos += 1
+        elif char == 0x29:  # )
+            if len(stack) == 1:
+                raise ValueError(f"Unbalanced ')' at offset {pos}")
+            stack.pop()
+            pos += 1
+        elif char == 0x22:  # "
+            pos = _parse_quoted(buf, pos, stack[-1])
+        elif char == 0x7B:  # {
+            close = buf.find(b"}", pos)
+            if close < 0:
+                raise ValueError(f"Unterminated literal marker at offset {pos}")
+            count = int(buf[pos + 1:close])
+            stack[-1].append(buf[close + 1:close + 1 + count])
+            pos = close + 1 + count
+        else:
+            pos = _parse_atom(buf, pos, stack[-1])
+    if len(stack) != 1:
+        raise ValueError("Unbalanced '(' in IMAP response")
+    return stack[0]
+
+
+def _parse_quoted(buf: bytes, pos: int, out: list[Token]) -> int:
+    chunks = bytearray()
+    pos += 1
+    while True:
+        if pos >= len(buf):
+            raise ValueError("Unterminated quoted string in IMAP response")
+        char = buf[pos]
+        if char == 0x5C:  # backslash escape
+            chunks.append(buf[pos + 1])
+            pos += 2
+        elif char == 0x22:
+            out.append(bytes(chunks))
+            return pos + 1
+        else:
+            chunks.append(char)
+            pos += 1
+
+
+def _parse_atom(buf: bytes, pos: int, out: list[Token]) -> int:
+    # Section specs such as BODY[HEADER.FIELDS (SUBJECT DATE)] contain
+    # spaces and parentheses, so brackets keep the atom open.
+    start, depth = pos, 0
+    while pos < len(buf):
+        char = buf[pos]
+        if char == 0x5B:  # [
+            depth += 1
+        elif char == 0x5D:  # ]
+            depth -= 1
+        elif depth == 0 and char in _ATOM_DELIMITERS:
+            break
+        pos += 1
+    atom = buf[start:pos]
+    out.append(None if atom.upper() == b"NIL" else atom)
+    return pos
+
+
+def join_response(data: list) -> bytes:
+    """Reassemble an imaplib response list into one parseable buffer."""
+    # Literals are the bulk of the response (whole attachment sections), so
+    # they are copied exactly once: into the joined buffer.
+    pieces: list[bytes] = []
+    for item in data:
+        if isinstance(item, tuple):
+            if pieces:
+                pieces.append(b" ")
+            pieces.append(item[0])
+            pieces.append(item[1])
+        elif isinstance(item, bytes):
+            if pieces:
+                pieces.append(b" ")
+            pieces.append(item)
+    return b"".join(pieces)
+
+
+def parse_fetch_response(data: list) -> dict[bytes, dict[bytes, Token]]:
+    """
+    Map UID → ``{ITEM-NAME: value}`` from an imaplib ``UID FETCH`` response.
+
+    Item names are uppercased (``b"BODYSTRUCTURE"``, ``b"BODY[2]"``, …).
+    Raises ValueError on malformed input.
+    """
+    result: dict[bytes, dict[bytes, Token]] = {}
+    for items in parse_tokens(join_response(data)):
+        if not isinstance(items, list):
+            continue  # message sequence number
+        fields: dict[bytes, Token] = {}
+        for idx in range(0, len(items) - 1, 2):
+            key = items[idx]
+            if isinstance(key, bytes):
+                fields[key.upper()] = items[idx + 1]
+        uid = fields.get(b"UID")
+        if isinstance(uid, bytes):
+            result[uid] = fields
+    return result
+
+
+def parse_esearch_all(data: list) -> list[bytes]:
+    """
+    Return the UIDs in an ESEARCH (RFC 4731) ``RETURN (ALL)`` response.
+
+    The response carries a compact sequence set (``1:3,7,9:12``) that is
+    expanded here; a response without an ``ALL`` item means no matches.
+    Raises ValueError on malformed input.
+    """
+    tokens = parse_tokens(join_response(data))
+    for idx, token in enumerate(tokens[:-1]):
+        if isinstance(token, bytes) and token.upper() == b"ALL":
+            value = tokens[idx + 1]
+            if not isinstance(value, bytes):
+                raise ValueError(f"Malformed ESEARCH ALL value: {value!r}")
+            return expand_sequence_set(value)
+    return []
+
+
+def expand_sequence_set(sequence_set: bytes) -> list[bytes]:
+    """Expand an IMAP sequence set such as ``b"1:3,7"`` into ``[b"1", b"2", b"3", b"7"]``."""
+    uids: list[bytes] = []
+    for item in sequence_set.split(b","):
+        first, sep, last = item.partition(b":")
+        if not sep:
+            uids.append(first)
+            continue
+        low, high = sorted((int(first), int(last)))
+        uids.extend(str(uid).encode() for uid in range(low, high + 1))
+    return uids
+
+
+def compress_sequence_set(uids: list[bytes]) -> bytes:
+    """
+    Fold *uids* into a compact IMAP sequence set: ``[b"1", b"2", b"3", b"7"]``
+    becomes ``b"1:3,7"``.  The inverse of :func:`expand_sequence_set`.
+    """
+    numbers = sorted({int(uid) for uid in uids})
+    ranges: list[bytes] = []
+    start = prev = None
+    for number in numbers:
+        if prev is not None and number == prev + 1:
+            prev = number
+            continue
+        if start is not None:
+            ranges.append(_sequence_range(start, prev))
+        start = prev = number
+    if start is not None:
+        ranges.append(_sequence_range(start, prev))
+    return b",".join(ranges)
+
+
+def _sequence_range(start: int, end: int) -> bytes:
+    return str(start).encode() if start == end else f"{start}:{end}".encode()
+
+
+def find_item(fields: dict[bytes, Token], prefix: bytes) -> Token:
+    """Return the first item whose name starts with *prefix* (e.g. ``b"BODY[HEADER"``)."""
+    for key, value in fields.items():
+        if key.startswith(prefix):
+            return value
+    return None
+
+
+# ---------------------------------------------------------------------------
+# BODYSTRUCTURE
+# ---------------------------------------------------------------------------
+
+
+def iter_body_parts(structure: list) -> Generator[BodyPart, None, None]:
+    """
+    Yield every leaf part of a parsed BODYSTRUCTURE with its section number.
+
+    Parts of attached messages (message/rfc822) are included, numbered the
+    way RFC 3501 addresses them (``2.1``, ``2.2``, …).
+    Raises ValueError when the structure is malformed.
+    """
+    try:
+        yield from _walk(structure, "")
+    except (IndexError, TypeError, AttributeError) as exc:
+        raise ValueError(f"Malformed BODYSTRUCTURE: {exc}") from exc
+
+
+def _walk(node: list, section: str) -> Generator[BodyPart, None, None]:
+    if isinstance(node[0], list):
+        # multipart: (child)(child)… "subtype" [extensions]
+        for idx, child in enumerate(node, 1):
+            if not isinstance(child, list):
+                break
+            yield from _walk(child, f"{section}.{idx}" if section else str(idx))
+        return
+
+    own = section or "1"
+    maintype = _text(node[0]).lower()
+    subtype = _text(node[1]).lower()
+
+    if maintype == "message" and subtype == "rfc822" and isinstance(node[8], list):
+        inner = node[8]
+        yield from _walk(inner, own if isinstance(inner[0], list) else f"{own}.1")
+        return
+
+    # Extension data follows the basic fields: text/* carries a line count,
+    # message/rfc822 an envelope, body and line count, before MD5 + disposition.
+    if maintype == "text":
+        disposition_index = 9
+    elif maintype == "message" and subtype == "rfc822":
+        disposition_index = 11
+    else:
+        disposition_index = 8
+    disposition = node[disposition_index] if len(node) > disposition_index else None
+
+    yield BodyPart(
+        section=own,
+        maintype=maintype,
+        subtype=subtype,
+        encoding=_text(node[5]).lower() or "7bit",
+        size=int(node[6] or 0),
+        headers=_rebuild_headers(maintype, subtype, node[2], disposition),
+    )
+
+
+def _rebuild_headers(
+    maintype: str, subtype: str, params: Token, disposition: Token
+) -> Message:
+    headers = Message()
+    headers.add_header("Content-Type", f"{maintype}/{subtype}", **_param_dict(params))
+    if isinstance(disposition, list) and disposition and disposition[0]:
+        headers.add_header(
+            "Content-Disposition",
+            _text(disposition[0]).lower(),
+            **_param_dict(disposition[1] if len(disposition) > 1 else None),
+        )
+    return headers
+
+
+def _param_dict(params: Token) -> dict[str, str]:
+    if not isinstance(params, list):
+        return {}
+    return {
+        _text(key).lower(): _text(value)
+        for key, value in zip(params[::2], params[1::2])
+        if isinstance(key, bytes) and isinstance(value, bytes)
+    }
+
+
+def _text(value: Token) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return ""
+
+
+# ---------------------------------------------------------------------------
+# Section decoding
+# ---------------------------------------------------------------------------
+
+
+def decode_section(data: bytes, encoding: str) -> bytes:
+    """Undo the Content-Transfer-Encoding of a fetched body section."""
+    if encoding == "base64":
+        return base64.b64decode(data)
+    if encoding == "quoted-printable":
+        return quopri.decodestring(data)
+    return data
@@ -14,27 +14,37 @@ Multiple accounts (JSON config file):
     cp accounts.example.json accounts.json   # fill in your details
     python main.py --accounts-file accounts.json
 
+Keep running and ingest new invoices as they arrive (Ctrl-C to stop):
+    python main.py --daemon --year 2026
+
 Setup:
     Copy .env.example → .env, fill in credentials, then:
         pip install -r requirements.txt
         python main.py
 """
 import argparse
+import functools
 import logging
 import os
 import sys
+import threading
 from datetime import datetime
 from pathlib import Path
-
-from dotenv import load_dotenv
-
-load_dotenv()
-
-from accounts import AccountConfig, account_from_env, load_accounts  # noqa: E402
-from imap_client import IMAPClient  # noqa: E402
-from storage import Storage  # noqa: E402
-from tax_export import export_tax_folders  # noqa: E402
-from utils import setup_logging  # noqa: E402
+from typing import TYPE_CHECKING
+
+from accounts import (
+    AccountConfig,
+    DispatchInterrupted,
+    account_from_env,
+    load_accounts,
+    run_per_account,
+)
+from utils import setup_logging
+
+# The pipeline modules pull in openai and the PDF/OCR backends; they are
+# imported where used so --help and argument/env errors return immediately.
+if TYPE_CHECKING:
+    from storage import Storage
 
 logger = logging.getLogger(__name__)
 
@@ -93,6 +103,23 @@ def _build_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="Classify and report invoices but do NOT write any files",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=(
+            "Ignore the classification cache (.classify_cache.sqlite in the "
+            "output directory) and send every document to OpenAI"
+        ),
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=(
+            "After the scan, keep the IMAP connections open and process new "
+            "mail as it arrives (IMAP IDLE) until interrupted with Ctrl-C. "
+            "Allows --year to be the current year."
+        ),
+    )
     parser.add_argument(
         "--tax-export-dir",
         type=Path,
@@ -120,6 +147,15 @@ _IMAP_ENV = ["IMAP_HOST", "IMAP_USER", "IMAP_PASSWORD"]
 _OPENAI_ENV = ["OPENAI_API_KEY"]
 
 
+def _load_env_file() -> None:
+    """Read .env, unless the environment already provides every credential."""
+    if all(os.environ.get(v, "").strip() for v in _IMAP_ENV + _OPENAI_ENV):
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
 def _validate_env() -> None:
     """Full validation for single-account mode (env vars only)."""
     missing = [
@@ -146,9 +182,9 @@ def _validate_openai_key() -> None:
         sys.exit(1)
 
 
-def _validate_year(year: int) -> None:
+def _validate_year(year: int, allow_current: bool = False) -> None:
     current = datetime.now().year
-    if year >= current:
+    if year > current or (year == current and not allow_current):
         logger.error(
             f"--year {year} is not a completed calendar year "
             f"(current year is {current}). Use {current - 1} or earlier."
@@ -168,16 +204,22 @@ def _process_account(
     account: AccountConfig,
     args: argparse.Namespace,
     use_label: bool,
-) -> Storage:
+    stop: threading.Event,
+) -> "Storage":
     """
     Run the full scan pipeline for a single *account*.
 
     *use_label* controls whether the account label is inserted into the
     invoice directory path (multi-account mode) or omitted (single-account /
-    backward-compatible mode).
+    backward-compatible mode).  With ``--daemon`` the account is then watched
+    for new mail until *stop* is set or Ctrl-C is pressed; setting *stop*
+    also ends the initial scan early.
 
     Returns the populated :class:`Storage` so the caller can aggregate stats.
     """
+    from imap_client import IMAPClient
+    from storage import Storage
+
     label = account.label if use_label else ""
 
     storage = Storage(
@@ -195,13 +237,23 @@ def _process_account(
     logger.info("-" * 60)
 
     try:
-        with IMAPClient(account) as client:
-            client.process_emails(year=args.year, storage=storage)
+        with IMAPClient(
+            account, use_cache=not args.no_cache, cache_dir=args.output_dir
+        ) as client:
+            last_uid = client.process_emails(
+                year=args.year, storage=storage, stop=stop
+            )
+            if args.daemon:
+                try:
+                    client.watch(args.year, storage, stop, last_uid)
+                except KeyboardInterrupt:
+                    logger.info(f"Stopped watching '{account.user}'")
     except Exception as exc:
         logger.exception(f"Error scanning account '{account.user}': {exc}")
         storage.increment_errors()
 
     storage.write_summary()
+    storage.close()
     if storage.invoice_count > 0:
         logger.info(f"Summary CSV → {storage.summary_path}")
 
@@ -225,7 +277,8 @@ def main() -> None:
     args = parser.parse_args()
 
     setup_logging(args.log_level)
-    _validate_year(args.year)
+    _validate_year(args.year, allow_current=args.daemon)
+    _load_env_file()
 
     # Load accounts ────────────────────────────────────────────────────────
     if args.accounts_file:
@@ -259,19 +312,32 @@ def main() -> None:
     logger.info(f"  Output dir     : {args.output_dir.resolve()}")
     logger.info(f"  Accounts       : {len(accounts)}")
     logger.info(f"  Dry-run mode   : {args.dry_run}")
+    if args.daemon:
+        logger.info("  Daemon mode    : watching for new mail (Ctrl-C to stop)")
     if not args.no_tax_export:
         logger.info(f"  Tax export dir : {tax_export_root.resolve()}")
     logger.info("=" * 60)
 
     # Scan all accounts ────────────────────────────────────────────────────
-    all_storage: list[Storage] = []
+    all_storage: list["Storage"] = []
+    stop = threading.Event()
 
     try:
-        for account in accounts:
-            storage = _process_account(account, args, use_label)
-            all_storage.append(storage)
-    except KeyboardInterrupt:
+        # Results come back in input order so summaries and the export stay
+        # stable; a single account stays on the main thread.
+        all_storage = run_per_account(
+            accounts,
+            functools.partial(_process_account, args=args, use_label=use_label, stop=stop),
+            # Running scans and watchers stop early and return their progress
+            on_interrupt=stop.set,
+        )
+    except KeyboardInterrupt as exc:
         logger.info("Interrupted by user — saving progress and exiting")
+        stop.set()
+        if isinstance(exc, DispatchInterrupted):
+            # Every account that finished, including those that finished
+            # after the interrupt while the running ones were waited for
+            all_storage = exc.results
         for s in all_storage:
             s.write_summary()
         _run_tax_export(all_storage, args, tax_export_root)
@@ -302,7 +368,7 @@ def main() -> None:
 
 
 def _run_tax_export(
-    all_storage: list[Storage],
+    all_storage: list["Storage"],
     args: argparse.Namespace,
     tax_export_root: Path,
 ) -> None:
@@ -318,8 +384,13 @@ def _run_tax_export(
         logger.info("Tax export skipped — no invoices were saved this run")
         return
 
+    from tax_export import export_tax_folders
+
     # Merge records from all accounts for richer signal
-    all_records = [rec for s in all_storage for rec in s.records]
+    all_columns: dict[str, list[str]] = {}
+    for s in all_storage:
+        for name, values in s.columns.items():
+            all_columns.setdefault(name, []).extend(values)
 
     logger.info("=" * 60)
     logger.info("Tax Classification Export")
@@ -331,7 +402,7 @@ def _run_tax_export(
         summary = export_tax_folders(
             invoices_root=args.output_dir,
             output_root=tax_export_root,
-            records=all_records,
+            columns=all_columns,
         )
     except Exception as exc:
         logger.exception(f"Tax export failed: {exc}")
@@ -5,24 +5,32 @@ Directory layout:
   <base_dir>/<year>/<vendor_sanitized>/<invoice_number>_<date>_<amount>_<currency>.<ext>
 
 Tracking file:
-  processed.json  — per-year set of already-processed email UIDs
+  processed_<year>.uids  — append-only log of already-processed email UIDs,
+                           one per line (processed_<label>_<year>.uids for
+                           labelled accounts); UIDs from a legacy
+                           processed.json are still honoured on load
 
 Summary file:
   invoices_summary_<year>.csv
 """
+import atexit
 import csv
+import functools
 import json
 import logging
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, fields
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Optional
 
 from classifier import ClassificationResult
-from utils import sanitize_filename
+from utils import json_loads, sanitize_filename
 
 logger = logging.getLogger(__name__)
 
-_PROCESSED_FILE = Path("processed.json")
+_LEGACY_PROCESSED_FILE = Path("processed.json")
+_PROCESSED_LOG_BUFFER = 1 << 16  # bytes buffered before the log hits the disk
+_PROCESSED_FLUSH_EVERY = 256     # flush the log after this many marks
 
 
 # ---------------------------------------------------------------------------
@@ -43,13 +51,40 @@ class InvoiceRecord:
     saved_path: str
 
 
+# Column order of Storage's record store (the InvoiceRecord field order)
+_RECORD_FIELDS: tuple[str, ...] = tuple(f.name for f in fields(InvoiceRecord))
+
+
+@functools.lru_cache(maxsize=1)
+def _load_legacy_processed() -> dict[str, list[str]]:
+    """
+    Year key → UIDs from a processed.json written by older versions.
+
+    The file is never written any more, so it is parsed once per process
+    rather than once per scanned account.
+    """
+    if not _LEGACY_PROCESSED_FILE.exists():
+        return {}
+    try:
+        data = json_loads(_LEGACY_PROCESSED_FILE.read_bytes())
+    except (json.JSONDecodeError, OSError) as exc:
+        logger.warning(f"Could not read {_LEGACY_PROCESSED_FILE} ({exc}) — ignoring it")
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
 # ---------------------------------------------------------------------------
 # Storage
 # ---------------------------------------------------------------------------
 
 
 class Storage:
-    """Manages invoice persistence, UID deduplication, and the CSV summary."""
+    """
+    Manages invoice persistence, UID deduplication, and the CSV summary.
+
+    Safe to share between the IMAP client's worker threads: every mutating
+    method runs under one lock.
+    """
 
     def __init__(
         self,
@@ -63,20 +98,36 @@ class Storage:
         self.dry_run = dry_run
         self._account_label = account_label
 
-        # When a label is set, namespace both the CSV name and the UID key so
-        # multiple accounts never collide in the same processed.json.
+        # Multi-account: base_dir / label / year
+        # Single-account: base_dir / year
+        if account_label:
+            self._output_dir = base_dir / account_label / str(year)
+        else:
+            self._output_dir = base_dir / str(year)
+
+        # When a label is set, namespace the CSV name and the UID log so
+        # multiple accounts never collide.
         if account_label:
             self.summary_path = Path(f"invoices_summary_{account_label}_{year}.csv")
+            self.processed_path = Path(f"processed_{account_label}_{year}.uids")
             self._year_key = f"{account_label}:{year}"
         else:
             self.summary_path = Path(f"invoices_summary_{year}.csv")
+            self.processed_path = Path(f"processed_{year}.uids")
             self._year_key = str(year)
 
-        self._processed_all: dict[str, list[str]] = self._load_processed_file()
-        self._processed_set: set[str] = set(
-            self._processed_all.get(self._year_key, [])
-        )
-        self._records: list[InvoiceRecord] = []
+        # UIDs stay bytes (as imaplib returns them) all the way to the log
+        self._processed_set: set[bytes] = self._load_processed()
+        self._processed_log: Optional[BinaryIO] = None
+        self._unflushed = 0
+        if not dry_run:
+            self._open_processed_log()
+        # Records are kept column-wise (one list per InvoiceRecord field) so
+        # the CSV and tax-export passes can walk whole columns at once.
+        self._columns: dict[str, list[str]] = {name: [] for name in _RECORD_FIELDS}
+        self._lock = threading.Lock()
+        # Output filename → last "_<n>" suffix used to dodge an existing file
+        self._dup_counters: dict[str, int] = {}
 
         # Public counters
         self.processed_count: int = 0
@@ -88,53 +139,111 @@ class Storage:
     # UID tracking
     # ------------------------------------------------------------------
 
-    @staticmethod
-    def _load_processed_file() -> dict[str, list[str]]:
-        if _PROCESSED_FILE.exists():
+    def _load_processed(self) -> set[bytes]:
+        legacy = _load_legacy_processed().get(self._year_key, [])
+        uids: set[bytes] = {uid.encode() for uid in legacy}
+        if self.processed_path.exists():
             try:
-                with _PROCESSED_FILE.open("r", encoding="utf-8") as fh:
-                    data = json.load(fh)
-                    if isinstance(data, dict):
-                        logger.debug(f"Loaded processed UIDs from {_PROCESSED_FILE}")
-                        return data
-            except (json.JSONDecodeError, OSError) as exc:
+                lines = self.processed_path.read_bytes().split(b"\n")
+                # Anything after the last newline is a line cut short by a
+                # crash; the truncated UID could match an unrelated message.
+                uids.update(lines[:-1])
+            except OSError as exc:
                 logger.warning(
-                    f"Could not read {_PROCESSED_FILE} ({exc}) — starting with empty state"
+                    f"Could not read {self.processed_path} ({exc}) — starting with empty state"
                 )
-        return {}
+        uids.discard(b"")
+        logger.debug(f"Loaded {len(uids)} processed UID(s) for {self._year_key}")
+        return uids
+
+    def _open_processed_log(self) -> None:
+        if self.processed_path.exists():
+            # Drop a torn last line (see _load_processed) before appending
+            with self.processed_path.open("r+b") as fh:
+                size = fh.seek(0, 2)
+                fh.seek(max(0, size - 64))
+                tail = fh.read()
+                if tail and not tail.endswith(b"\n"):
+                    fh.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+        self._processed_log = self.processed_path.open(
+            "ab", buffering=_PROCESSED_LOG_BUFFER
+        )
+        # Marks still buffered when the interpreter exits (e.g. after an
+        # unhandled exception or Ctrl-C) reach the disk all the same.
+        atexit.register(self.close)
 
-    def _persist_processed(self) -> None:
-        self._processed_all[self._year_key] = sorted(self._processed_set)
+    def _flush_processed(self) -> None:
+        if self._processed_log is None:
+            return
         try:
-            with _PROCESSED_FILE.open("w", encoding="utf-8") as fh:
-                json.dump(self._processed_all, fh, indent=2)
+            self._processed_log.flush()
         except OSError as exc:
-            logger.error(f"Could not write {_PROCESSED_FILE}: {exc}")
+            logger.error(f"Could not write {self.processed_path}: {exc}")
+        self._unflushed = 0
 
-    def is_processed(self, uid: str) -> bool:
+    def load_processed_set(self) -> frozenset[bytes]:
+        """Snapshot of the UIDs already processed for this year/account."""
+        with self._lock:
+            return frozenset(self._processed_set)
+
+    def is_processed(self, uid: bytes) -> bool:
         return uid in self._processed_set
 
-    def mark_processed(self, uid: str) -> None:
-        self._processed_set.add(uid)
-        self._persist_processed()
+    def mark_processed(self, uid: bytes) -> None:
+        with self._lock:
+            if uid in self._processed_set:
+                return
+            self._processed_set.add(uid)
+            if self._processed_log is None:
+                return
+            try:
+                self._processed_log.write(uid + b"\n")
+            except OSError as exc:
+                logger.error(f"Could not write {self.processed_path}: {exc}")
+                return
+            self._unflushed += 1
+            if self._unflushed >= _PROCESSED_FLUSH_EVERY:
+                self._flush_processed()
+
+    def close(self) -> None:
+        """Flush and close the processed-UID log."""
+        with self._lock:
+            self._flush_processed()
+            if self._processed_log is not None:
+                self._processed_log.close()
+                self._processed_log = None
+                atexit.unregister(self.close)
 
     # ------------------------------------------------------------------
     # Counters
     # ------------------------------------------------------------------
 
     def increment_processed(self) -> None:
-        self.processed_count += 1
+        with self._lock:
+            self.processed_count += 1
 
     def increment_attachments(self) -> None:
-        self.attachment_count += 1
+        with self._lock:
+            self.attachment_count += 1
 
     def increment_errors(self) -> None:
-        self.error_count += 1
+        with self._lock:
+            self.error_count += 1
 
     @property
     def records(self) -> list[InvoiceRecord]:
-        """Read-only view of all invoice records collected this run."""
-        return list(self._records)
+        """Invoice records collected this run, built row-wise from the columns."""
+        with self._lock:
+            return [
+                InvoiceRecord(*row)
+                for row in zip(*(self._columns[name] for name in _RECORD_FIELDS))
+            ]
+
+    @property
+    def columns(self) -> dict[str, list[str]]:
+        """Snapshot of the record store: InvoiceRecord field name → values."""
+        with self._lock:
+            return {name: list(values) for name, values in self._columns.items()}
 
     # ------------------------------------------------------------------
     # Invoice saving
@@ -159,12 +268,7 @@ class Storage:
         Falls back to the original filename when metadata is incomplete.
         """
         ext = Path(filename).suffix.lower() or ".pdf"
-        # Multi-account: base_dir / label / year
-        # Single-account: base_dir / year
-        if self._account_label:
-            output_dir = self.base_dir / self._account_label / str(self.year)
-        else:
-            output_dir = self.base_dir / str(self.year)
+        output_dir = self._output_dir
 
         # Build output filename from metadata when available
         has_meta = (
@@ -185,47 +289,90 @@ class Storage:
         out_path = output_dir / out_name
 
         # Enforce path containment — prevent any traversal attack
-        try:
-            out_path.resolve().relative_to(output_dir.resolve())
-        except ValueError:
+        if not self._is_contained(out_path):
             logger.error(
                 f"Path traversal detected for '{filename}' → '{out_path}' — skipping"
             )
-            self.error_count += 1
+            self.increment_errors()
             return
 
+        # The file is written outside the lock so concurrent saves overlap
+        # their disk I/O; exclusive creation makes the name claim atomic.
         if not self.dry_run:
-            output_dir.mkdir(parents=True, exist_ok=True)
-
-            # Avoid silent overwrites: append counter suffix when needed
-            if out_path.exists():
-                stem, counter = out_path.stem, 1
-                while out_path.exists():
-                    out_path = output_dir / f"{stem}_{counter}{ext}"
-                    counter += 1
-
-            try:
-                out_path.write_bytes(data)
-                logger.info(f"Saved invoice → {out_path}")
-            except OSError as exc:
-                logger.error(f"Could not write invoice to '{out_path}': {exc}")
-                self.error_count += 1
+            out_path = self._write_new_file(output_dir, out_path, data)
+            if out_path is None:
+                self.increment_errors()
                 return
 
-        self.invoice_count += 1
-        self._records.append(
-            InvoiceRecord(
-                vendor=classification.vendor,
-                invoice_number=classification.invoice_number,
-                date=classification.date,
-                total_amount=classification.total_amount,
-                currency=classification.currency,
-                original_filename=filename,
-                email_subject=email_subject,
-                email_date=email_date,
-                saved_path=str(out_path) if not self.dry_run else "(dry-run)",
+        with self._lock:
+            self.invoice_count += 1
+            columns = self._columns
+            columns["vendor"].append(classification.vendor)
+            columns["invoice_number"].append(classification.invoice_number)
+            columns["date"].append(classification.date)
+            columns["total_amount"].append(classification.total_amount)
+            columns["currency"].append(classification.currency)
+            columns["original_filename"].append(filename)
+            columns["email_subject"].append(email_subject)
+            columns["email_date"].append(email_date)
+            columns["saved_path"].append(
+                str(out_path) if not self.dry_run else "(dry-run)"
             )
-        )
+
+    def _is_contained(self, out_path: Path) -> bool:
+        """True if *out_path* (a name joined onto the output dir) stays inside it."""
+        name = out_path.name
+        # A plain name cannot leave the directory, so the filesystem is only
+        # consulted for names with separators or dot-segments.  (Symlinks in
+        # the directory are harmless: exclusive creation never follows them.)
+        if (
+            out_path.parent == self._output_dir
+            and "/" not in name
+            and "\\" not in name
+            and name not in ("", ".", "..")
+        ):
+            return True
+        try:
+            out_path.resolve().relative_to(self._output_dir.resolve())
+        except ValueError:
+            return False
+        return True
+
+    def _write_new_file(
+        self, output_dir: Path, out_path: Path, data: bytes
+    ) -> Optional[Path]:
+        """
+        Write *data* to *out_path*, or to ``<stem>_<n><ext>`` if that name is
+        taken — existing files are never overwritten.  Returns the path
+        written, or ``None`` on error.
+        """
+        name, stem, ext = out_path.name, out_path.stem, out_path.suffix
+        try:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            while True:
+                try:
+                    fh = out_path.open("xb")
+                    break
+                except FileExistsError:
+                    # Continue from the last suffix used for this name instead
+                    # of probing _1, _2, … from the start on every duplicate
+                    with self._lock:
+                        counter = self._dup_counters.get(name, 0) + 1
+                        self._dup_counters[name] = counter
+                    out_path = output_dir / f"{stem}_{counter}{ext}"
+        except OSError as exc:
+            logger.error(f"Could not write invoice to '{out_path}': {exc}")
+            return None
+
+        try:
+            with fh:
+                fh.write(data)
+        except OSError as exc:
+            logger.error(f"Could not write invoice to '{out_path}': {exc}")
+            out_path.unlink(missing_ok=True)
+            return None
+        logger.info(f"Saved invoice → {out_path}")
+        return out_path
 
     # ------------------------------------------------------------------
     # CSV summary
@@ -245,31 +392,22 @@ class Storage:
 
     def write_summary(self) -> None:
         """Write all invoice records to a CSV file."""
-        if not self._records:
+        with self._lock:
+            self._flush_processed()
+        columns = self.columns
+        count = len(columns["saved_path"])
+        if not count:
             logger.info("No invoices detected — summary CSV not written")
             return
 
         try:
             with self.summary_path.open("w", newline="", encoding="utf-8") as fh:
-                writer = csv.DictWriter(fh, fieldnames=self._CSV_FIELDS)
-                writer.writeheader()
-                for rec in self._records:
-                    writer.writerow(
-                        {
-                            "vendor": rec.vendor,
-                            "invoice_number": rec.invoice_number,
-                            "date": rec.date,
-                            "total_amount": rec.total_amount,
-                            "currency": rec.currency,
-                            "original_filename": rec.original_filename,
-                            "email_subject": rec.email_subject,
-                            "email_date": rec.email_date,
-                            "saved_path": rec.saved_path,
-                        }
-                    )
+                writer = csv.writer(fh)
+                writer.writerow(self._CSV_FIELDS)
+                writer.writerows(zip(*(columns[name] for name in self._CSV_FIELDS)))
             logger.info(
                 f"Summary CSV written → {self.summary_path} "
-                f"({len(self._records)} record(s))"
+                f"({count} record(s))"
             )
         except OSError as exc:
             logger.error(f"Failed to write CSV summary: {exc}")
@@ -16,19 +16,29 @@ Typical call after the invoice pipeline has finished::
     summary = export_tax_folders(
         invoices_root=Path("invoices"),
         output_root=Path("."),
-        records=storage.records,       # optional but recommended
+        columns=storage.columns,       # optional but recommended
     )
     print(f"Deductible: {summary.deductible}  Not deductible: {summary.not_deductible}")
 """
 import logging
+import os
+import re
 import shutil
+import sys
+import unicodedata
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Iterable, Iterator, Mapping, Optional, Sequence
 
 if TYPE_CHECKING:
     from storage import InvoiceRecord
 
+if sys.platform.startswith("linux"):
+    import fcntl
+else:
+    fcntl = None
+
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
@@ -161,12 +171,44 @@ _DEDUCTIBLE_KEYWORDS: frozenset[str] = frozenset(
     ]
 )
 
+try:
+    # Optional: pyahocorasick finds any keyword in one pass over a signal
+    # instead of one substring scan per keyword.
+    import ahocorasick
+
+    _DEDUCTIBLE_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in _DEDUCTIBLE_KEYWORDS:
+        _DEDUCTIBLE_AUTOMATON.add_word(_keyword, _keyword)
+    _DEDUCTIBLE_AUTOMATON.make_automaton()
+except ImportError:
+    _DEDUCTIBLE_AUTOMATON = None
+
+try:
+    # Optional: without pyahocorasick, google-re2 still matches all keywords
+    # in one linear pass.  (A stdlib ``re`` alternation is no faster than the
+    # substring scans on long subjects, so it is not a fallback.)
+    import re2
+
+    _DEDUCTIBLE_RE = re2.compile(
+        "|".join(re.escape(kw) for kw in sorted(_DEDUCTIBLE_KEYWORDS))
+    )
+except ImportError:
+    _DEDUCTIBLE_RE = None
+
 _FOLDER_DEDUCTIBLE = "ABSETZBAR"
 _FOLDER_NOT_DEDUCTIBLE = "NICHT_ABSETZBAR"
 
 _INVOICE_EXTENSIONS: frozenset[str] = frozenset(
     [".pdf", ".png", ".jpg", ".jpeg", ".docx"]
 )
+# Copies run concurrently; each is bound on disk I/O, not the GIL
+_COPY_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# Linux ioctl that makes a file share another's extents (Btrfs, XFS, …)
+_FICLONE = 0x40049409
+
+# str.endswith accepts a tuple and checks every suffix in one C call
+_INVOICE_SUFFIXES: tuple[str, ...] = tuple(_INVOICE_EXTENSIONS)
 
 
 # ---------------------------------------------------------------------------
@@ -189,32 +231,101 @@ class TaxExportSummary:
 # ---------------------------------------------------------------------------
 
 
-def _is_deductible(signal: str) -> bool:
-    """Return True if *signal* contains at least one deductible keyword."""
-    lowered = signal.lower()
-    return any(kw in lowered for kw in _DEDUCTIBLE_KEYWORDS)
+def _is_deductible(signals: Iterable[str]) -> bool:
+    """
+    Return True if any lowercased signal contains a deductible keyword.
 
+    Signals are scanned in order and the scan stops at the first hit, so the
+    short and most telling one (the vendor) should come first.
+    """
+    for lowered in signals:
+        if _DEDUCTIBLE_AUTOMATON is not None:
+            # iter() is lazy: stops at the first keyword found
+            if next(_DEDUCTIBLE_AUTOMATON.iter(lowered), None) is not None:
+                return True
+        elif _DEDUCTIBLE_RE is not None:
+            if _DEDUCTIBLE_RE.search(lowered) is not None:
+                return True
+        elif any(kw in lowered for kw in _DEDUCTIBLE_KEYWORDS):
+            return True
+    return False
+
+
+def _path_key(path: str) -> str:
+    """
+    Normalize *path* for the saved_path → signals lookup.
+
+    Directory listings may spell a path differently from the string Storage
+    recorded: Windows paths differ in case and separators, and macOS can
+    return decomposed (NFD) umlauts.
+    """
+    if not path.isascii():
+        path = unicodedata.normalize("NFC", path)
+    return os.path.normcase(path)
 
-def _signal_from_record(record: "InvoiceRecord") -> str:
-    """Build a classification signal string from an InvoiceRecord."""
-    return " ".join(
-        filter(
-            None,
-            [
-                record.vendor,
-                record.original_filename,
-                record.email_subject,
-                record.invoice_number,
-            ],
+
+def _lowered_signals(parts: Iterable[str]) -> tuple[str, ...]:
+    return tuple(part.lower() for part in parts if part)
+
+
+def _signals_from_record(record: "InvoiceRecord") -> tuple[str, ...]:
+    """Lowercased classification signals of an InvoiceRecord, vendor first."""
+    return _lowered_signals(
+        (
+            record.vendor,
+            record.original_filename,
+            record.email_subject,
+            record.invoice_number,
         )
     )
 
 
-def _signal_from_path(path: Path, invoices_root: Path) -> str:
+def _signals_from_columns(
+    columns: Mapping[str, Sequence[str]],
+) -> dict[str, tuple[str, ...]]:
+    """Map normalized saved_path → lowercased signals for column-wise records (see Storage.columns)."""
+    return {
+        _path_key(path): _lowered_signals(parts)
+        for path, *parts in zip(
+            columns["saved_path"],
+            columns["vendor"],
+            columns["original_filename"],
+            columns["email_subject"],
+            columns["invoice_number"],
+        )
+        if path and path != "(dry-run)"
+    }
+
+
+def _iter_invoice_paths(root: Path) -> Iterator[str]:
+    """
+    Yield the path of every invoice file below *root*, depth-first.
+
+    ``os.scandir`` reports each entry's type from the directory listing, so
+    unlike ``Path.rglob`` + ``is_file`` no file costs an extra ``stat``.
+    Symlinks are not followed.
+    """
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif (
+                        entry.is_file(follow_symlinks=False)
+                        and entry.name.lower().endswith(_INVOICE_SUFFIXES)
+                    ):
+                        yield entry.path
+        except OSError as exc:
+            logger.warning("Cannot list directory during tax export: %s", exc)
+
+
+def _signals_from_path(path: Path, invoices_root: Path) -> tuple[str, ...]:
     """
-    Build a classification signal from the file path alone.
+    Build lowercased classification signals from the file path alone.
 
-    Uses the vendor directory name and the file stem as signal, which is
+    Uses the vendor directory name and the file stem as signals, which is
     sufficient when no in-memory records are available (e.g. standalone run).
     """
     try:
@@ -222,27 +333,67 @@ def _signal_from_path(path: Path, invoices_root: Path) -> str:
         parts = list(relative.parent.parts) + [path.stem]
     except ValueError:
         parts = [path.stem]
-    return " ".join(parts)
+    return _lowered_signals(parts)
 
 
-def _safe_copy(src: Path, dest_dir: Path) -> Optional[Path]:
+def _reserve_destination(src: Path, dest_dir: Path) -> Optional[Path]:
     """
-    Copy *src* to *dest_dir* using shutil.copy2 (preserves metadata).
+    Claim a free name for *src* in *dest_dir* by creating it empty.
 
     Appends an integer suffix if the destination filename already exists.
-    Returns the final destination path, or None on error.
+    Each attempt is an atomic O_EXCL create, so neither concurrent copies
+    nor other processes can claim the same destination.
+    Returns the reserved path, or None on error.
     """
     dest = dest_dir / src.name
-    if dest.exists():
-        stem, ext, counter = src.stem, src.suffix, 1
-        while dest.exists():
-            dest = dest_dir / f"{stem}_{counter}{ext}"
+    counter = 0
+    while True:
+        try:
+            os.close(os.open(dest, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+            return dest
+        except FileExistsError:
+            # Collisions are rare: only then is the name split into stem/suffix
             counter += 1
+            dest = dest_dir / f"{src.stem}_{counter}{src.suffix}"
+        except OSError as exc:
+            logger.error("Cannot create %s: %s", dest, exc)
+            return None
+
+
+def _clone_file(src: Path, dest: Path) -> bool:
+    """
+    Reflink *src* onto *dest*: the copy shares the source's data blocks
+    until either side is modified, so no bytes are read or written.
+
+    Returns False when the platform or filesystem cannot clone (ext4, tmpfs,
+    different filesystems, non-Linux); *dest* is then left truncated.
+    """
+    if fcntl is None:
+        return False
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            return False
+    return True
+
+
+def _safe_copy(src: Path, dest: Path) -> Optional[Path]:
+    """
+    Copy *src* onto the reserved *dest*, preserving metadata like shutil.copy2.
+
+    The data is reflinked where the filesystem supports it and copied
+    otherwise.  Returns *dest*, or None on error (the reservation is then
+    removed).
+    """
     try:
-        shutil.copy2(src, dest)
+        if not _clone_file(src, dest):
+            shutil.copyfile(src, dest)
+        shutil.copystat(src, dest)
         return dest
     except OSError as exc:
-        logger.error(f"copy2 failed: {src} → {dest_dir}: {exc}")
+        logger.error("Copy failed: %s → %s: %s", src, dest, exc)
+        dest.unlink(missing_ok=True)
         return None
 
 
@@ -255,6 +406,7 @@ def export_tax_folders(
     invoices_root: Path,
     output_root: Path,
     records: Optional[list] = None,  # list[InvoiceRecord] — optional but recommended
+    columns: Optional[Mapping[str, Sequence[str]]] = None,
 ) -> TaxExportSummary:
     """
     Copy every saved invoice into ABSETZBAR or NICHT_ABSETZBAR.
@@ -272,6 +424,10 @@ def export_tax_folders(
         current run.  When supplied, the vendor name and email subject from
         the AI classification are used as the primary deductibility signal,
         which is more accurate than path-only heuristics.
+    columns:
+        The same information column-wise, as returned by
+        :attr:`storage.Storage.columns`.  Cheaper than *records* for large
+        runs; may be combined with it.
 
     Returns
     -------
@@ -283,12 +439,14 @@ def export_tax_folders(
     deductible_dir.mkdir(parents=True, exist_ok=True)
     not_deductible_dir.mkdir(parents=True, exist_ok=True)
 
-    # Build a fast lookup: saved_path (str) → signal string
-    path_to_signal: dict[str, str] = {}
+    # Build a fast lookup: saved_path (str) → signals, lowercased once here
+    path_to_signals: dict[str, tuple[str, ...]] = {}
+    if columns:
+        path_to_signals.update(_signals_from_columns(columns))
     if records:
         for rec in records:
             if rec.saved_path and rec.saved_path != "(dry-run)":
-                path_to_signal[rec.saved_path] = _signal_from_record(rec)
+                path_to_signals[_path_key(rec.saved_path)] = _signals_from_record(rec)
 
     # Collect invoice files
     if not invoices_root.exists():
@@ -297,11 +455,7 @@ def export_tax_folders(
         )
         return TaxExportSummary(total=0, deductible=0, not_deductible=0, errors=0)
 
-    invoice_files = sorted(
-        p
-        for p in invoices_root.rglob("*")
-        if p.is_file() and p.suffix.lower() in _INVOICE_EXTENSIONS
-    )
+    invoice_files = sorted(_iter_invoice_paths(invoices_root))
 
     if not invoice_files:
         logger.info("No invoice files found in '%s' — tax export skipped", invoices_root)
@@ -309,31 +463,49 @@ def export_tax_folders(
 
     total = deductible = not_deductible = errors = 0
 
-    for invoice_path in invoice_files:
+    # Classify and reserve destinations in order on this thread (so suffixes
+    # stay deterministic), then let the pool copy the bytes.
+    copies: list[tuple[Path, bool, Future]] = []
+    with ThreadPoolExecutor(
+        max_workers=min(len(invoice_files), _COPY_WORKERS),
+        thread_name_prefix="tax-copy",
+    ) as pool:
+        for invoice_file in invoice_files:
+            invoice_path = Path(invoice_file)
+
+            # Prefer record-based signals; fall back to path heuristic
+            signals = path_to_signals.get(_path_key(invoice_file))
+            if signals is None:
+                signals = _signals_from_path(invoice_path, invoices_root)
+
+            is_deductible = _is_deductible(signals)
+            dest_dir = deductible_dir if is_deductible else not_deductible_dir
+
+            dest = _reserve_destination(invoice_path, dest_dir)
+            if dest is None:
+                errors += 1
+                continue
+            copies.append(
+                (invoice_path, is_deductible, pool.submit(_safe_copy, invoice_path, dest))
+            )
+
+    for invoice_path, is_deductible, future in copies:
+        dest = future.result()
+        if dest is None:
+            errors += 1  # failed copies are not counted in totals
+            continue
         total += 1
-
-        # Prefer record-based signal; fall back to path heuristic
-        signal = path_to_signal.get(
-            str(invoice_path), _signal_from_path(invoice_path, invoices_root)
-        )
-
-        if _is_deductible(signal):
-            dest_dir = deductible_dir
+        if is_deductible:
             deductible += 1
-            label = _FOLDER_DEDUCTIBLE
         else:
-            dest_dir = not_deductible_dir
             not_deductible += 1
-            label = _FOLDER_NOT_DEDUCTIBLE
-
-        dest = _safe_copy(invoice_path, dest_dir)
-        if dest is None:
-            errors += 1
-            total -= 1  # don't count failed copies in totals
-            deductible -= label == _FOLDER_DEDUCTIBLE
-            not_deductible -= label == _FOLDER_NOT_DEDUCTIBLE
-        else:
-            logger.debug(f"[{label}] {invoice_path.name} → {dest}")
+        # Lazy formatting: runs per file, but debug is usually off
+        logger.debug(
+            "[%s] %s → %s",
+            _FOLDER_DEDUCTIBLE if is_deductible else _FOLDER_NOT_DEDUCTIBLE,
+            invoice_path.name,
+            dest,
+        )
 
     return TaxExportSummary(
         total=total,
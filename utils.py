@@ -1,11 +1,28 @@
 """
-Utility functions: logging setup, filename sanitization, extension validation.
+Utility functions: logging setup, filename sanitization, extension validation,
+JSON decoding.
 """
+import functools
 import logging
 import re
 import sys
 from pathlib import Path
 
+try:
+    # orjson parses 2-3× faster than the stdlib and allocates fewer objects.
+    # Its JSONDecodeError subclasses json.JSONDecodeError, so callers catch
+    # the same exception either way.
+    from orjson import loads as json_loads  # noqa: F401
+except ImportError:
+    from json import loads as json_loads  # noqa: F401
+
+# Built once: the sanitizers run several times per saved invoice.
+# Drops null bytes and replaces path separators + reserved chars in one pass.
+_FILENAME_TABLE = str.maketrans({"\x00": None} | dict.fromkeys('/\\<>:"|?*', "_"))
+_FILENAME_RUNS_RE = re.compile(r"[\s_]+")
+_VENDOR_DISALLOWED_RE = re.compile(r"[^a-z0-9äöüß\s\-]")
+_VENDOR_RUNS_RE = re.compile(r"[\s\-]+")
+
 
 def setup_logging(level: str = "INFO") -> None:
     """Configure structured logging to stdout with a clean format."""
@@ -29,6 +46,7 @@ def setup_logging(level: str = "INFO") -> None:
         logging.getLogger(noisy).setLevel(logging.WARNING)
 
 
+@functools.lru_cache(maxsize=4096)
 def sanitize_filename(name: str) -> str:
     """
     Sanitize a string for safe use as a filename component.
@@ -37,16 +55,16 @@ def sanitize_filename(name: str) -> str:
     - Replaces shell-unsafe characters with underscores
     - Collapses whitespace/underscore runs
     - Limits to 100 characters
+
+    Memoized: currencies, dates and amounts repeat across invoices.
     """
     if not name:
         return "unknown"
-    name = name.replace("\x00", "")
-    # Strip path separators — most critical for traversal prevention
-    name = re.sub(r"[/\\]", "_", name)
-    # Remove characters unsafe on Windows/Linux filesystems
-    name = re.sub(r'[<>:"|?*]', "_", name)
+    # Drop null bytes, strip path separators (most critical for traversal
+    # prevention) and characters unsafe on Windows/Linux filesystems
+    name = name.translate(_FILENAME_TABLE)
     # Collapse runs of whitespace and underscores
-    name = re.sub(r"[\s_]+", "_", name)
+    name = _FILENAME_RUNS_RE.sub("_", name)
     name = name.strip("._")
     return name[:100] if name else "unknown"
 
@@ -63,8 +81,8 @@ def sanitize_vendor_name(vendor: str) -> str:
 
     clean = vendor.lower()
     # Allow German umlauts, alphanumerics, spaces, hyphens
-    clean = re.sub(r"[^a-z0-9äöüß\s\-]", "", clean)
-    clean = re.sub(r"[\s\-]+", "_", clean)
+    clean = _VENDOR_DISALLOWED_RE.sub("", clean)
+    clean = _VENDOR_RUNS_RE.sub("_", clean)
     clean = clean.strip("_")
     return clean[:80] if clean else "unknown_vendor"
 